@@ -20,6 +20,7 @@ SCRIPTS = {
     "publish": "scripts/publish.py",
     "analyze": "scripts/analyze.py",
     "database": "scripts/database_integration.py",
+    "bench": "scripts/benchmarks.py",
 }
 
 
@@ -37,6 +38,7 @@ def main():
         print("  publish      - 發布內容")
         print("  analyze      - 分析統計")
         print("  database     - 資料庫整合測試")
+        print("  bench        - 效能基準測試")
         print("")
         print("範例：")
         print("  python run.py collect")
@@ -2,9 +2,8 @@
 import os
 import sys
 import glob
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from collections import Counter
-from dateutil import parser as dtparser
 
 # Add project root to Python path for imports
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,8 +20,8 @@ def date_dirs_in_range(start, end):
                 sel = os.path.join(d, "selected.json")
                 if os.path.exists(sel):
                     try:
-                        folder = d.replace("data/", "")
-                        dt = dtparser.parse(folder.replace("/", "-")).date()
+                        parts = d.replace("data/", "").split("/")
+                        dt = date(*map(int, parts))
                         if start.date() <= dt <= end.date():
                             paths.append((dt, sel))
                     except Exception:
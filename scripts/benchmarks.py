@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+效能基準測試
+用法：
+  python run.py bench timestamps [--n 100000]
+  python run.py bench keywords [--n 100000]
+  python run.py bench scoring [--n 1000000]
+  python run.py bench collect --cassettes data/cassettes [--latency 0.2 --jitter 0.05 --error-rate 0.05]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts import utils
+
+
+def timed(label, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed:8.3f}s")
+    return elapsed, result
+
+
+def sample_timestamps(n, sources=20, seed=7):
+    """模擬各來源的時間字串：NewsAPI 的 ISO Z、RSS 的 RFC-822、帶時區位移的 ISO"""
+    rng = random.Random(seed)
+    base = datetime(2025, 8, 22, tzinfo=timezone.utc)
+    styles = [
+        lambda d: d.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        lambda d: d.strftime("%a, %d %b %Y %H:%M:%S +0000"),
+        lambda d: d.astimezone(timezone(timedelta(hours=8))).isoformat(),
+    ]
+    out = []
+    for _ in range(n):
+        src = rng.randrange(sources)
+        d = base + timedelta(seconds=rng.randrange(30 * 86400))
+        out.append((f"source-{src}", styles[src % len(styles)](d)))
+    return out
+
+
+def bench_timestamps(args):
+    print(f"⏱️ 時間解析：{args.n:,} 筆")
+    samples = sample_timestamps(args.n)
+
+    def legacy():
+        return [utils.dtparser.parse(v).astimezone(utils.TZ) for _, v in samples]
+
+    def fast():
+        return [utils.parse_timestamp(v, src) for src, v in samples]
+
+    def display_legacy():
+        return [utils.dtparser.parse(v).date().isoformat() for v in iso]
+
+    def display_fast():
+        return [utils.to_display_date(v) for v in iso]
+
+    t_old, old = timed("dateutil.parser.parse", legacy)
+    t_new, new = timed("parse_timestamp", fast)
+    assert old == new, "解析結果不一致"
+    print(f"  → 加速 {t_old / t_new:.1f}x")
+    iso = [d.isoformat() for d in new]
+    t_old, _ = timed("to_display_date (舊)", display_legacy)
+    t_new, _ = timed("to_display_date", display_fast)
+    print(f"  → 加速 {t_old / t_new:.1f}x")
+
+
+def sample_articles(n, seed=7):
+    """以 keywords.yaml 的詞彙混合一般字詞產生模擬文章"""
+    rng = random.Random(seed)
+    kw = utils.load_yaml("config/keywords.yaml")
+    vocab = [w for words in kw["weights"].values() for w in words]
+    filler = "the model new team data system users update week report".split()
+    sources = ["OpenAI Blog", "TechCrunch", "The Verge", "Google DeepMind", "Ars Technica"]
+    base = datetime(2025, 8, 22, tzinfo=timezone.utc)
+    out = []
+    for _ in range(n):
+        words = [
+            rng.choice(vocab) if rng.random() < 0.08 else rng.choice(filler) for _ in range(60)
+        ]
+        published = base - timedelta(seconds=rng.randrange(7 * 86400))
+        out.append(
+            {
+                "title": " ".join(words[:10]),
+                "summary": " ".join(words[10:]),
+                "source": rng.choice(sources),
+                "published_at": published.isoformat(),
+                "published_ts": int(published.timestamp()),
+            }
+        )
+    return out
+
+
+def legacy_rule_score(item):
+    """改版前的 process.rule_score：每篇重新讀 YAML、逐一子字串掃描"""
+    kw = utils.load_yaml("config/keywords.yaml")
+    text = f"{(item.get('title') or '').lower()} {(item.get('summary') or '').lower()}"
+    score = 0
+    groups = (("technical_breakthrough", 10), ("industry_impact", 8), ("practical_value", 7))
+    for group, points in groups:
+        for k in kw["weights"][group]:
+            if k.lower() in text:
+                score += points
+    pub = utils.article_epoch(item)
+    if pub is not None:
+        score += max(0, 5 - int((datetime.now(timezone.utc).timestamp() - pub) // 86400))
+    else:
+        score += 1
+    source = item.get("source", "").lower()
+    if any(b.lower() in source for b in kw.get("boost_publishers", [])):
+        score += 2
+    return score
+
+
+def bench_keywords(args):
+    from scripts.keyword_matcher import get_scorer
+
+    print(f"⏱️ 關鍵字評分：{args.n:,} 篇")
+    articles = sample_articles(args.n)
+    t_old, old = timed("rule_score (舊)", lambda: [legacy_rule_score(a) for a in articles])
+    t_new, new = timed("KeywordScorer.score_many", get_scorer().score_many, articles)
+    same = sum(a == b for a, b in zip(old, new))
+    # 差異來自字邊界：舊版子字串比對會讓 "code" 命中 "decode"
+    print(f"  → 加速 {t_old / t_new:.1f}x，{same / len(articles):.1%} 分數相同")
+
+
+def bench_scoring(args):
+    """逐篇評分與欄位式評分比較（回測封存文章的情境）"""
+    from scripts.keyword_matcher import get_scorer
+    from scripts import vector_scoring
+
+    # 生成百萬篇太慢，先產生一批再重複使用（不影響掃描的文字量）
+    base = sample_articles(min(args.n, 20000))
+    articles = [dict(a) for a in (base * (args.n // len(base) + 1))[: args.n]]
+    print(f"⏱️ 批次評分：{len(articles):,} 篇")
+    t_old, old = timed("KeywordScorer.score_many", get_scorer().score_many, articles)
+    t_new, new = timed("vector_scoring.rule_scores", vector_scoring.rule_scores, articles)
+    assert list(new) == old, "評分結果不一致"
+    print(f"  → 加速 {t_old / t_new:.1f}x")
+    def ranked_python():
+        return sorted(range(len(old)), key=old.__getitem__, reverse=True)[:20]
+
+    t_sort, ranked = timed("sorted()[:20]", ranked_python)
+    t_top, top = timed("top_k (argpartition)", vector_scoring.top_k, new, 20)
+    assert list(top) == ranked, "Top-K 不一致"
+    print(f"  → 加速 {t_sort / t_top:.1f}x")
+
+
+def bench_collect(args):
+    """以錄製的 cassette 在本機重播，量測完整收集流程（不需網路）"""
+    from scripts import collect, http_replay
+
+    server, base_url = http_replay.start_server(
+        args.cassettes, 0, args.latency, args.jitter, args.error_rate, seed=7
+    )
+    os.environ["HTTP_REPLAY_URL"] = base_url
+    cfg = utils.load_yaml("config/sources.yaml")
+    print(f"⏱️ 重播收集：{args.cassettes}，共 {args.rounds} 輪")
+    try:
+        for i in range(args.rounds):
+            batches, timings = timed(f"第 {i + 1} 輪", collect.collect_all, cfg)[1]
+            n = sum(len(b["articles"]) for b in batches)
+            print(f"    {n} 則，各來源 {timings}")
+    finally:
+        server.shutdown()
+        del os.environ["HTTP_REPLAY_URL"]
+
+
+BENCHES = {
+    "timestamps": bench_timestamps,
+    "keywords": bench_keywords,
+    "scoring": bench_scoring,
+    "collect": bench_collect,
+}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="效能基準測試")
+    ap.add_argument("bench", choices=sorted(BENCHES) + ["all"])
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--cassettes", default="data/cassettes")
+    ap.add_argument("--latency", type=float, default=None)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args(argv)
+    for name in sorted(BENCHES) if args.bench == "all" else [args.bench]:
+        BENCHES[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+先便宜後昂貴的評分串接
+所有收集到的文章都先用本地規則分數（vector_scoring）排序，只把前 K 則送給 LLM；
+K 由 pipeline.yaml 的 cascade 延遲 / 呼叫次數預算推得。統計寫入當日 metadata.json。
+"""
+
+import os
+import sys
+import time
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import today_path, read_json, write_json, iso_now
+from scripts.vector_scoring import rank_articles
+
+
+def llm_budget(pipeline, workers=1):
+    """依預算推得可送 LLM 的文章數 K"""
+    cfg = (pipeline or {}).get("cascade") or {}
+    per_call = int(((pipeline or {}).get("llm_batch") or {}).get("max_items", 20))
+    # 延遲預算內可完成幾輪呼叫，每輪 workers 個批次併發
+    rounds = float(cfg.get("latency_budget_seconds", 60)) / float(cfg.get("seconds_per_call", 20))
+    calls = min(int(cfg.get("max_calls", 2)), max(1, int(rounds * max(1, workers))))
+    return max(1, min(int(cfg.get("max_llm_items", 30)), calls * per_call))
+
+
+def prefilter(articles, pipeline, workers=1):
+    """全部文章先以規則分數排序，回傳 (送 LLM 的前 K 則, 統計)"""
+    k = llm_budget(pipeline, workers)
+    started = time.perf_counter()
+    top, scores = rank_articles(articles, k=k)
+    floor = ((pipeline or {}).get("cascade") or {}).get("min_rule_score")
+    if floor is not None:
+        keep = int((scores >= floor).sum())
+        top, scores = top[:keep], scores[:keep]
+    stats = {
+        "total": len(articles),
+        "rule_scored": len(articles),
+        "llm_budget": k,
+        "llm_sent": len(top),
+        "min_rule_score": floor,
+        "rule_threshold": int(scores[-1]) if len(scores) else None,
+        "rule_seconds": round(time.perf_counter() - started, 3),
+    }
+    print(
+        f"🪜 規則評分 {len(articles)} 則，前 {len(top)} 則送 AI 評分"
+        f"（門檻 {stats['rule_threshold']} 分）"
+    )
+    return top, stats
+
+
+def record_cascade(workflow, stats, base=None):
+    """把串接統計寫入當日 metadata.json 的 cascade 區塊"""
+    path = f"{base or 'data/' + today_path()}/metadata.json"
+    meta = read_json(path, default={}) or {}
+    meta.setdefault("cascade", {})[workflow] = dict(stats, at=iso_now())
+    write_json(path, meta)
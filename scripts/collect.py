@@ -1,39 +1,108 @@
 #!/usr/bin/env python
 import os
 import sys
-import requests
+import time
+import argparse
+import threading
 import feedparser
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import partial
 from urllib.parse import urlencode
 
 # Add project root to Python path for imports
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from scripts.utils import today_path, write_json, normalize_article, load_yaml
+from scripts.utils import (
+    today_path,
+    write_json,
+    read_json,
+    append_jsonl,
+    normalize_article,
+    load_yaml,
+    iso_now,
+    load_raw_articles,
+    parse_timestamp,
+)
+from scripts.http_client import http_get
+from scripts.feed_cache import fetch_feed
+from scripts.near_dedup import collapse_near_duplicates
+from scripts.seen_index import open_seen_index, today_start
+from scripts.poll_scheduler import AdaptiveScheduler
+from scripts.extract import extract_bodies
+from scripts.resilience import Resilience, CircuitOpenError
 
+# 各來源預設並行上限（可於 sources.yaml 以 concurrency 覆寫）
+DEFAULT_CONCURRENCY = {"newsapi": 1, "rss": 8, "fallback_hn_algolia": 1}
+WATERMARK_PATH = "data/state/watermarks.json"
 
-def fetch_newsapi(cfg):
+
+def fetch_pages(fetch_page, cfg, stop_before=None):
+    """分頁並行抓取
+
+    每一波並行抓 page_concurrency 頁，直到頁數、文章數或時間預算用完、
+    某頁為空，或結果已早於水位 stop_before（增量模式）為止。
+    """
+    max_pages = int(cfg.get("max_pages", 1))
+    max_articles = int(cfg.get("max_articles", 100))
+    concurrency = max(1, int(cfg.get("page_concurrency", 3)))
+    deadline = time.monotonic() + float(cfg.get("time_budget", 30))
+    out = []
+    page = 1
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while page <= max_pages and len(out) < max_articles:
+            wave = list(range(page, min(page + concurrency, max_pages + 1)))
+            futures = [pool.submit(fetch_page, p) for p in wave]
+            page += len(wave)
+            done = False
+            for p, fut in zip(wave, futures):
+                try:
+                    articles = fut.result()
+                except Exception as ex:
+                    if p == 1:
+                        raise
+                    # 後續分頁失敗（例如超出方案可翻頁上限）就停在已取得的結果
+                    print(f"第 {p} 頁讀取失敗，停止翻頁:", ex)
+                    articles = []
+                if not articles:
+                    done = True
+                    break
+                out += articles
+                if stop_before and min(a["published_at"] for a in articles) <= stop_before:
+                    done = True
+                    break
+            if done or time.monotonic() >= deadline:
+                break
+    return out[:max_articles]
+
+
+def watermark_of(key):
+    return (read_json(WATERMARK_PATH, default={}) or {}).get(key) or {}
+
+
+def fetch_newsapi(cfg, timeout=30, incremental=False):
     if not cfg.get("enabled", False):
         return []
     api_key = os.getenv("NEWS_API_KEY")
     if not api_key:
         print("NEWS_API_KEY 未設定，跳過 NewsAPI。")
         return []
-    params = {
-        "q": cfg.get("query", "artificial intelligence"),
-        "language": cfg.get("language", "en"),
-        "pageSize": int(cfg.get("page_size", 50)),
-        "sortBy": "publishedAt",
-    }
-    url = "https://newsapi.org/v2/everything?" + urlencode(params)
     headers = {"X-Api-Key": api_key}
-    r = requests.get(url, headers=headers, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    arts = []
-    for a in data.get("articles", []):
-        arts.append(
+
+    def fetch_page(page):
+        params = {
+            "q": cfg.get("query", "artificial intelligence"),
+            "language": cfg.get("language", "en"),
+            "pageSize": int(cfg.get("page_size", 50)),
+            "sortBy": "publishedAt",
+            "page": page,
+        }
+        url = "https://newsapi.org/v2/everything?" + urlencode(params)
+        r = http_get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        return [
             normalize_article(
                 a.get("title"),
                 a.get("url"),
@@ -41,97 +110,447 @@ def fetch_newsapi(cfg):
                 (a.get("source") or {}).get("name", "NewsAPI"),
                 a.get("description") or "",
             )
-        )
+            for a in data.get("articles", [])
+        ]
+
+    stop_before = watermark_of("newsapi").get("published_at") if incremental else None
+    arts = fetch_pages(fetch_page, cfg, stop_before)
     print(f"NewsAPI 取得 {len(arts)} 則")
     return arts
 
 
+def parse_rss(content):
+    d = feedparser.parse(content)
+    out = []
+    for e in d.entries:
+        out.append(
+            normalize_article(
+                getattr(e, "title", ""),
+                getattr(e, "link", ""),
+                getattr(e, "published", getattr(e, "updated", "")),
+                d.feed.get("title", "RSS"),
+                getattr(e, "summary", ""),
+            )
+        )
+    return out
+
+
+def fetch_rss_feed(url, timeout=20):
+    entries, from_cache = fetch_feed(url, parse_rss, timeout=timeout)
+    if from_cache:
+        print(f"RSS 未更新（304），沿用快取 {len(entries)} 則: {url}")
+    return entries
+
+
 def fetch_rss(cfg):
     if not cfg.get("enabled", False):
         return []
-    out = []
-    for url in cfg.get("feeds", []):
-        try:
-            d = feedparser.parse(url)
-            for e in d.entries:
-                out.append(
-                    normalize_article(
-                        getattr(e, "title", ""),
-                        getattr(e, "link", ""),
-                        getattr(e, "published", getattr(e, "updated", "")),
-                        d.feed.get("title", "RSS"),
-                        getattr(e, "summary", ""),
-                    )
-                )
-        except Exception as ex:
-            print("RSS 讀取錯誤:", url, ex)
+    batches, _ = run_tasks(_rss_tasks(cfg), {"rss": cfg})
+    out = [a for b in batches for a in b["articles"]]
     print(f"RSS 取得 {len(out)} 則")
     return out
 
 
-def fetch_hn_algolia(cfg):
+def fetch_hn_algolia(cfg, timeout=20, incremental=False):
     if not cfg.get("enabled", False):
         return []
-    import requests
-
     q = cfg.get("query", "ai")
-    url = "https://hn.algolia.com/api/v1/search_by_date?" + urlencode(
-        {"query": q, "tags": "story"}
-    )
-    try:
-        r = requests.get(url, timeout=20)
+    params = {"query": q, "tags": "story", "hitsPerPage": int(cfg.get("hits_per_page", 50))}
+    if incremental:
+        # Algolia 可直接在伺服器端過濾水位之後的文章；含水位當秒，同秒已見的由水位 id 排除
+        mark = parse_timestamp(watermark_of("fallback_hn_algolia").get("published_at"))
+        if mark:
+            params["numericFilters"] = f"created_at_i>={int(mark.timestamp())}"
+
+    def fetch_page(page):
+        # Algolia 分頁從 0 開始；錯誤交由 run_tasks 記錄，讓韌性控制能計入失敗
+        url = "https://hn.algolia.com/api/v1/search_by_date?" + urlencode(
+            dict(params, page=page - 1)
+        )
+        r = http_get(url, timeout=timeout)
         r.raise_for_status()
         data = r.json()
-        out = []
-        for h in data.get("hits", []):
-            out.append(
-                normalize_article(
-                    h.get("title"),
-                    h.get("url")
-                    or f"https://news.ycombinator.com/item?id={h.get('objectID')}",
-                    h.get("created_at"),
-                    "HackerNews",
-                    "",
-                )
+        return [
+            normalize_article(
+                h.get("title"),
+                h.get("url")
+                or f"https://news.ycombinator.com/item?id={h.get('objectID')}",
+                h.get("created_at"),
+                "HackerNews",
+                "",
             )
-        print(f"HN Algolia 取得 {len(out)} 則")
-        return out
-    except Exception as ex:
-        print("HN Algolia 讀取錯誤:", ex)
-        return []
+            for h in data.get("hits", [])
+        ]
+
+    out = fetch_pages(fetch_page, cfg)
+    print(f"HN Algolia 取得 {len(out)} 則")
+    return out
+
+
+def _rss_tasks(cfg):
+    return [("rss", url, partial(fetch_rss_feed, url)) for url in cfg.get("feeds", [])]
+
+
+def build_tasks(cfg, incremental=False):
+    """依 sources.yaml 建立 (來源, 工作鍵, 函式) 清單，RSS 每個 feed 各為一個工作
+
+    incremental 時分頁來源翻到水位即停止。
+    """
+    tasks = []
+    newsapi = cfg.get("newsapi", {})
+    if newsapi.get("enabled", False):
+        fn = partial(fetch_newsapi, newsapi, incremental=incremental)
+        tasks.append(("newsapi", "newsapi", fn))
+    rss = cfg.get("rss", {})
+    if rss.get("enabled", False):
+        tasks += _rss_tasks(rss)
+    hn = cfg.get("fallback_hn_algolia", {})
+    if hn.get("enabled", False):
+        fn = partial(fetch_hn_algolia, hn, incremental=incremental)
+        tasks.append(("fallback_hn_algolia", "fallback_hn_algolia", fn))
+    return tasks
+
+
+def iter_tasks(tasks, cfg, guard=None):
+    """以執行緒池並行執行收集工作，每個來源受各自的 concurrency 上限約束
+
+    guard 為 resilience.Resilience 時，每個工作套用自適應逾時、斷路與對沖請求。
+    依完成順序產出 (工作索引, batch, 開始時間, 結束時間)，讓下游不必等所有來源結束
+    """
+    if not tasks:
+        return
+    sizes = {}
+    for source, _, _ in tasks:
+        if source not in sizes:
+            n = (cfg.get(source) or {}).get(
+                "concurrency", DEFAULT_CONCURRENCY.get(source, 4)
+            )
+            sizes[source] = max(1, int(n))
+    limits = {source: threading.BoundedSemaphore(n) for source, n in sizes.items()}
+    workers = min(len(tasks), sum(sizes.values()))
+
+    def run(source, key, fn):
+        with limits[source]:
+            started = time.perf_counter()
+            try:
+                articles = guard.call(key, fn) if guard else fn()
+            except CircuitOpenError:
+                print("⛔ 斷路中，略過:", key)
+                articles = []
+            except Exception as ex:
+                print("來源讀取錯誤:", key, ex)
+                articles = []
+            return articles, started, time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, *task): i for i, task in enumerate(tasks)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            source, key, _ = tasks[i]
+            articles, started, finished = fut.result()
+            batch = {
+                "source": source,
+                "key": key,
+                "articles": articles,
+                "seconds": round(finished - started, 3),
+            }
+            yield i, batch, started, finished
+
+
+def run_tasks(tasks, cfg, guard=None):
+    """執行全部收集工作，回傳 (batches, timings)
+
+    batches 依工作順序排列，timings 為各來源的實際耗時（秒）
+    """
+    batches = [
+        {"source": source, "key": key, "articles": [], "seconds": 0.0}
+        for source, key, _ in tasks
+    ]
+    spans = {}
+    for i, batch, started, finished in iter_tasks(tasks, cfg, guard):
+        batches[i] = batch
+        lo, hi = spans.get(batch["source"], (started, finished))
+        spans[batch["source"]] = (min(lo, started), max(hi, finished))
+    timings = {source: round(hi - lo, 3) for source, (lo, hi) in spans.items()}
+    return batches, timings
+
+
+def open_guard():
+    pipeline = load_yaml("config/pipeline.yaml") or {}
+    return Resilience.from_config(pipeline.get("resilience"))
+
+
+def collect_all(cfg, guard=None, incremental=False):
+    """並行收集所有已啟用來源，回傳 (batches, timings)"""
+    started = time.perf_counter()
+    own_guard = guard is None
+    guard = open_guard() if own_guard else guard
+    batches, timings = run_tasks(build_tasks(cfg, incremental), cfg, guard)
+    if guard is not None:
+        if guard.summary():
+            print("⚠️ 斷路狀態:", guard.summary())
+        if own_guard:
+            guard.save()
+    for source, seconds in timings.items():
+        n = sum(len(b["articles"]) for b in batches if b["source"] == source)
+        print(f"⏱️ {source}: {seconds:.2f}s，{n} 則")
+    timings["total"] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ 收集總耗時 {timings['total']:.2f}s")
+    return batches, timings
 
 
 def dedup(articles):
-    seen = set()
-    out = []
+    """近似重複去重：同一則新聞（不同來源、標題微調、追蹤參數網址）只保留一則"""
+    out = collapse_near_duplicates(articles)
+    if len(out) < len(articles):
+        print(f"🧹 去重：{len(articles)} → {len(out)} 則")
+    return out
+
+
+def drop_seen(articles, seen, before=None):
+    """以跨日已見索引剔除舊文章；新舊文章都登記進索引，舊文章刷新 last_seen，持續出現的不會被淘汰"""
+    if seen is None:
+        return articles
+    fresh, stale = seen.split(articles, before=before)
+    if stale:
+        print(f"🗂️ 略過 {len(stale)} 則先前已收集的文章")
+    seen.add(a["id"] for a in articles)
+    return fresh
+
+
+def _mark_ids(mark):
+    # 舊版水位只記一個 id
+    return set(mark.get("ids") or ([mark["id"]] if mark.get("id") else []))
+
+
+def is_after_watermark(article, mark):
+    """發布時間晚於水位，或與水位同一時間但 id 尚未見過；無發布時間的文章一律交給已見索引"""
+    if not mark or article.get("undated"):
+        return True
+    if article["published_at"] != mark["published_at"]:
+        return article["published_at"] > mark["published_at"]
+    return article["id"] not in _mark_ids(mark)
+
+
+def advance_watermark(mark, articles):
+    """以本次看到的最新發布時間推進水位，並記下該時間點的所有 id（同一秒多則不會重複追加）"""
     for a in articles:
-        key = (a["title"][:120], a["url"])
-        if key in seen:
+        if a.get("undated"):
             continue
-        seen.add(key)
-        out.append(a)
-    return out
+        if not mark or a["published_at"] > mark["published_at"]:
+            mark = {"published_at": a["published_at"], "ids": [a["id"]]}
+        elif a["published_at"] == mark["published_at"]:
+            ids = _mark_ids(mark)
+            if a["id"] not in ids:
+                mark = {"published_at": mark["published_at"], "ids": sorted(ids | {a["id"]})}
+    return mark
 
 
-def main():
-    cfg = load_yaml("config/sources.yaml")
-    all_ = []
-    all_ += fetch_newsapi(cfg.get("newsapi", {}))
-    all_ += fetch_rss(cfg.get("rss", {}))
-    all_ += fetch_hn_algolia(cfg.get("fallback_hn_algolia", {}))
-    all_ = dedup(all_)
-    date_path = today_path()
-    base = f"data/{date_path}"
-    write_json(f"{base}/raw_news.json", all_)
+def count_sources(articles, origin):
+    counts = {}
+    for a in articles:
+        counts[origin[a["id"]]] = counts.get(origin[a["id"]], 0) + 1
+    return counts
+
+
+def write_snapshot(base, articles, cfg, timings, source_counts=None):
+    """覆寫今日快照；metadata 的 runs 延續先前的增量紀錄，source_counts 依本次快照重算"""
+    previous = read_json(f"{base}/metadata.json", default={}) or {}
+    write_json(f"{base}/raw_news.json", articles)
     write_json(
         f"{base}/metadata.json",
         {
             "collected_at": datetime.now(timezone.utc).isoformat(),
-            "count": len(all_),
+            "count": len(articles),
             "sources": [k for k, v in cfg.items() if v.get("enabled")],
+            "source_counts": source_counts or {},
+            "runs": previous.get("runs", 0) + 1,
+            "timings": timings,
         },
     )
-    print("✅ 收集完成")
+
+
+def append_incremental(base, batches, cfg, timings, seen=None, extraction=None):
+    """只把水位之後的新文章追加到 raw_news.jsonl，並就地更新 metadata.json 計數"""
+    marks = read_json(WATERMARK_PATH, default={})
+    fresh = []
+    origin = {}
+    for b in batches:
+        mark = marks.get(b["key"])
+        for a in b["articles"]:
+            if is_after_watermark(a, mark):
+                fresh.append(a)
+                origin[a["id"]] = b["source"]
+        marks[b["key"]] = advance_watermark(mark, b["articles"])
+    fresh = drop_seen(dedup(fresh), seen)
+    if extraction:
+        extract_bodies(fresh, extraction)
+    per_source = count_sources(fresh, origin)
+    append_jsonl(f"{base}/raw_news.jsonl", fresh)
+
+    meta = read_json(f"{base}/metadata.json", default={})
+    meta["collected_at"] = iso_now()
+    meta["count"] = meta.get("count", 0) + len(fresh)
+    meta["sources"] = [k for k, v in cfg.items() if v.get("enabled")]
+    counts = meta.get("source_counts", {})
+    for source, n in per_source.items():
+        counts[source] = counts.get(source, 0) + n
+    meta["source_counts"] = counts
+    meta["runs"] = meta.get("runs", 0) + 1
+    meta["timings"] = timings
+    write_json(f"{base}/metadata.json", meta)
+    # 先寫資料再推進水位：中途失敗最多重抓，不會漏資料
+    write_json(WATERMARK_PATH, marks)
+    return fresh
+
+
+def update_watermarks(batches):
+    marks = read_json(WATERMARK_PATH, default={})
+    for b in batches:
+        marks[b["key"]] = advance_watermark(marks.get(b["key"]), b["articles"])
+    write_json(WATERMARK_PATH, marks)
+
+
+def run_daemon(cfg, daemon_cfg, seen=None, extraction=None):
+    """常駐收集：依各 feed 的更新頻率排程輪詢，新文章增量寫入當日資料夾"""
+    tasks = {key: (source, key, fn) for source, key, fn in build_tasks(cfg, True)}
+    guard = open_guard()
+    scheduler = AdaptiveScheduler(
+        tasks.keys(),
+        min_interval=int(daemon_cfg.get("min_interval", 300)),
+        max_interval=int(daemon_cfg.get("max_interval", 6 * 3600)),
+        default_interval=int(daemon_cfg.get("default_interval", 1800)),
+        backoff=float(daemon_cfg.get("backoff", 1.5)),
+        min_interval_by_key=daemon_cfg.get("min_interval_by_source", {}),
+    )
+    print(f"🛰️ 常駐收集已啟動，共 {len(tasks)} 個來源")
+    day = today_path()
+    try:
+        while True:
+            due = scheduler.pop_due()
+            if not due:
+                time.sleep(min(scheduler.seconds_until_next(), 60))
+                continue
+            batches, timings = run_tasks([tasks[k] for k in due], cfg, guard)
+            if seen is not None and today_path() != day:
+                seen.evict()
+            day = today_path()
+            base = f"data/{day}"
+            fresh = append_incremental(base, batches, cfg, timings, seen, extraction)
+            fresh_ids = {a["id"] for a in fresh}
+            for b in batches:
+                new_count = sum(1 for a in b["articles"] if a["id"] in fresh_ids)
+                scheduler.record(b["key"], b["articles"], new_count)
+                print(
+                    f"🔁 {b['key']}: 新增 {new_count} 則，"
+                    f"下次 {scheduler.state[b['key']]['interval'] / 60:.0f} 分鐘後"
+                )
+            scheduler.save()
+            if guard is not None:
+                guard.save()
+            if seen is not None:
+                seen.save()
+    except KeyboardInterrupt:
+        print("🛑 常駐收集已停止")
+    finally:
+        scheduler.save()
+
+
+def extraction_config(pipeline, force=False):
+    extraction = pipeline.get("extraction") or {}
+    return extraction if (force or extraction.get("enabled")) else None
+
+
+def collect_once(cfg, pipeline, incremental=False, extract=False):
+    """執行一次收集：完整模式覆寫今日快照，增量模式只追加新文章"""
+    seen = open_seen_index(pipeline.get("seen_index"))
+    extraction = extraction_config(pipeline, extract)
+    batches, timings = collect_all(cfg, incremental=incremental)
+    base = f"data/{today_path()}"
+    try:
+        if incremental:
+            fresh = append_incremental(base, batches, cfg, timings, seen, extraction)
+            print(f"✅ 增量收集完成，新增 {len(fresh)} 則")
+        else:
+            origin = {a["id"]: b["source"] for b in batches for a in b["articles"]}
+            articles = dedup([a for b in batches for a in b["articles"]])
+            # 完整模式會覆寫今日快照，只剔除「前幾天」見過的文章
+            articles = drop_seen(articles, seen, before=today_start())
+            if extraction:
+                extract_bodies(articles, extraction)
+            write_snapshot(base, articles, cfg, timings, count_sources(articles, origin))
+            update_watermarks(batches)
+            print("✅ 收集完成")
+    finally:
+        if seen is not None:
+            seen.evict()
+            seen.save()
+    return base
+
+
+def snapshot_age_minutes(base):
+    meta = read_json(f"{base}/metadata.json", default=None)
+    try:
+        collected = datetime.fromisoformat(meta["collected_at"])
+    except (TypeError, KeyError, ValueError):
+        return None
+    return (datetime.now(timezone.utc) - collected).total_seconds() / 60
+
+
+def collect_news(max_age_minutes=None):
+    """共用收集入口（collect.py 與兩階段流程共用）
+
+    今日快照在 max_age_minutes 內就直接沿用；過期則只抓增量；沒有快照才完整收集。
+    """
+    cfg = load_yaml("config/sources.yaml")
+    pipeline = load_yaml("config/pipeline.yaml") or {}
+    if max_age_minutes is None:
+        max_age_minutes = (pipeline.get("snapshot") or {}).get("max_age_minutes", 60)
+    base = f"data/{today_path()}"
+    articles = load_raw_articles(base)
+    age = snapshot_age_minutes(base)
+    if articles and age is not None and age <= max_age_minutes:
+        print(f"♻️ 沿用 {age:.0f} 分鐘前的快照（{len(articles)} 則）")
+        return articles
+    collect_once(cfg, pipeline, incremental=bool(articles))
+    return load_raw_articles(base)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="收集新聞")
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量模式：依各來源水位只追加新文章到 raw_news.jsonl",
+    )
+    ap.add_argument(
+        "--daemon",
+        action="store_true",
+        help="常駐模式：依各 feed 更新頻率自動排程輪詢（隱含增量模式）",
+    )
+    ap.add_argument(
+        "--extract",
+        action="store_true",
+        help="去重後擷取文章全文（亦可於 pipeline.yaml 的 extraction.enabled 開啟）",
+    )
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml("config/sources.yaml")
+    pipeline = load_yaml("config/pipeline.yaml") or {}
+    if args.daemon:
+        seen = open_seen_index(pipeline.get("seen_index"))
+        try:
+            run_daemon(
+                cfg,
+                pipeline.get("daemon", {}),
+                seen,
+                extraction_config(pipeline, args.extract),
+            )
+        finally:
+            if seen is not None:
+                seen.save()
+        return
+    collect_once(cfg, pipeline, incremental=args.incremental, extract=args.extract)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+文章全文擷取
+- 下載：有上限的執行緒池 + 每個網域的最小請求間隔
+- 解析：beautifulsoup4 去除導覽、頁首頁尾等樣板，在行程池中執行避免佔用 GIL
+- 儲存：以文章 id 定址的 gzip 檔 data/bodies/<id[:2]>/<id>.txt.gz，已擷取者不再重抓
+"""
+
+import os
+import sys
+import gzip
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import ensure_dir
+from scripts.http_client import http_get
+
+BODY_DIR = "data/bodies"
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+    "form",
+    "figure",
+    "iframe",
+]
+
+
+def body_path(article_id):
+    return os.path.join(BODY_DIR, article_id[:2], f"{article_id}.txt.gz")
+
+
+def has_body(article_id):
+    return os.path.exists(body_path(article_id))
+
+
+def load_body(article_id):
+    path = body_path(article_id)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def save_body(article_id, text):
+    path = body_path(article_id)
+    ensure_dir(os.path.dirname(path))
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def best_summary(article, limit=600):
+    """有擷取到全文時以全文開頭取代被截斷的摘要"""
+    body = load_body(article["id"]) if article.get("has_body") else None
+    if body and len(body) > len(article.get("summary") or ""):
+        return body[:limit]
+    return article.get("summary", "")
+
+
+def extract_text(html, min_paragraph=40):
+    """去除樣板後取出正文段落（在子行程中執行）"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    container = soup.find("article")
+    if container is None:
+        # 沒有 <article> 時取段落文字總量最多的區塊
+        best, best_len = soup.body or soup, 0
+        for node in soup.find_all(["main", "section", "div"]):
+            paragraphs = node.find_all("p", recursive=False)
+            n = sum(len(p.get_text(strip=True)) for p in paragraphs)
+            if n > best_len:
+                best, best_len = node, n
+        container = best
+    paragraphs = [p.get_text(" ", strip=True) for p in container.find_all("p")]
+    return "\n\n".join(p for p in paragraphs if len(p) >= min_paragraph)
+
+
+class DomainRateLimiter:
+    """同一網域兩次請求間至少間隔 interval 秒"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        domain = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(domain, now))
+            self.next_allowed[domain] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def extract_bodies(articles, cfg=None):
+    """為尚未擷取過的文章下載並解析全文，回傳統計"""
+    cfg = cfg or {}
+    todo = []
+    for a in articles:
+        if not a.get("url"):
+            continue
+        if has_body(a["id"]):
+            a["has_body"] = True
+        else:
+            todo.append(a)
+    stats = {"skipped": len(articles) - len(todo), "extracted": 0, "failed": 0}
+    if not todo:
+        return stats
+
+    limiter = DomainRateLimiter(float(cfg.get("per_domain_interval", 1.0)))
+    timeout = int(cfg.get("timeout", 15))
+
+    def download(article):
+        limiter.wait(article["url"])
+        r = http_get(article["url"], timeout=timeout)
+        r.raise_for_status()
+        return r.content
+
+    started = time.perf_counter()
+    fetchers = ThreadPoolExecutor(max_workers=int(cfg.get("fetch_workers", 8)))
+    parsers = ProcessPoolExecutor(max_workers=int(cfg.get("parse_workers", 2)))
+    with fetchers, parsers:
+        downloads = {fetchers.submit(download, a): a for a in todo}
+        parses = {}
+        for fut in as_completed(downloads):
+            article = downloads[fut]
+            try:
+                parses[parsers.submit(extract_text, fut.result())] = article
+            except Exception as ex:
+                print("全文下載失敗:", article["url"], ex)
+                stats["failed"] += 1
+        for fut in as_completed(parses):
+            article = parses[fut]
+            try:
+                text = fut.result()
+            except Exception as ex:
+                print("全文解析失敗:", article["url"], ex)
+                stats["failed"] += 1
+                continue
+            # 內文過短（付費牆、純影音頁）也存檔，避免下次重抓
+            save_body(article["id"], text)
+            article["has_body"] = True
+            stats["extracted"] += 1
+    print(
+        f"📄 全文擷取：新增 {stats['extracted']}、略過 {stats['skipped']}、"
+        f"失敗 {stats['failed']}（{time.perf_counter() - started:.1f}s）"
+    )
+    return stats
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Feed 條件式 GET 快取
+以 ETag / Last-Modified 驗證器發出條件式請求，304 時直接沿用上次解析結果
+每個 feed 一個檔案：data/cache/feeds/<sha1>.json
+"""
+
+import os
+import sys
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import sha1, iso_now, read_json, write_json
+from scripts.http_client import http_get
+
+CACHE_DIR = "data/cache/feeds"
+
+
+def cache_path(url, namespace="collect"):
+    return os.path.join(CACHE_DIR, f"{sha1(namespace + ':' + url)}.json")
+
+
+def load_entry(url, namespace="collect"):
+    try:
+        return read_json(cache_path(url, namespace))
+    except Exception:
+        # 損毀的快取檔視同不存在
+        return None
+
+
+def conditional_headers(entry):
+    headers = {}
+    if not entry:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def fetch_feed(url, parse, timeout=20, namespace="collect"):
+    """條件式抓取 feed
+
+    parse(content) 負責把回應內容轉成 entries 清單；伺服器回 304 時不會呼叫 parse，
+    直接回傳快取中的 entries。回傳 (entries, from_cache)。
+    """
+    entry = load_entry(url, namespace)
+    r = http_get(url, headers=conditional_headers(entry), timeout=timeout)
+    if r.status_code == 304 and entry is not None:
+        return entry.get("entries", []), True
+    r.raise_for_status()
+    entries = parse(r.content)
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if etag or last_modified:
+        write_json(
+            cache_path(url, namespace),
+            {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": iso_now(),
+                "entries": entries,
+            },
+        )
+    return entries, False
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+格式 A（社群傳播版）map-reduce 生成
+- map：每則新聞的段落（分類、重點、摘要、洞察、反思）各自並行生成，
+  依「內容雜湊 + PROMPT_VERSION」快取，增減一則只需重生那一則
+- reduce：只拿各段落的標題與重點兩行產生「最後總結」，提示詞長度不隨全文成長
+- SectionCache：段落快取，存於當日輸出目錄的 format_a_sections.json
+- Speculator：互動 / Web 模式階段 1 完成後以單一背景執行緒預先生成前 N 則候選的段落，
+  編輯挑選期間就先完成；重新選擇時直接沿用快取
+"""
+
+import os
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import sha1, read_json, write_json
+
+# 段落提示詞或結構有變動時遞增，舊快取自然失效
+PROMPT_VERSION = "a2"
+
+HEADING = "【格式A：社群傳播版】"
+
+SECTION_FIELDS = (
+    "title",
+    "summary",
+    "source",
+    "url",
+    "published_at",
+    "category",
+    "key_point",
+    "key_data",
+)
+
+SECTION_STRUCTURE = """🏷️【分類】新聞標題
+
+💡一句話重點（≤20 字）
+
+摘要（120–150 字）：核心事實 + 2–3 關鍵訊息 + 影響範圍
+
+關鍵洞察：
+技術突破：X
+實務影響：X
+行動建議：X
+
+創新實踐者反思：
+→ 跨界連結：X
+→ 實踐路徑：X
+→ 核心啟發：X"""
+
+SUMMARY_STRUCTURE = """📊 最後總結
+【今日三大趨勢】：列 3 點（每點 ≤20 字）
+【金句洞察】：1 句
+【立即行動】：角色＋時間＋具體行動＋量化效果"""
+
+
+def section_fields(item):
+    return {k: item.get(k, "") for k in SECTION_FIELDS}
+
+
+def section_key(item):
+    """同一則新聞內容不變時鍵值不變，與候選編號、分數無關"""
+    payload = json.dumps(section_fields(item), ensure_ascii=False, sort_keys=True)
+    return sha1(PROMPT_VERSION + payload)
+
+
+def section_digest(section, max_chars=80):
+    """段落的前兩行（🏷️ 分類標題、💡 一句話重點），供 reduce 使用"""
+    lines = [line.strip() for line in section.splitlines() if line.strip()]
+    return "\n".join(line[:max_chars] for line in lines[:2])
+
+
+def section_prompt(item, today):
+    return f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
+
+請以 繁體中文、時區 Asia/Taipei，依 [今天日期：{today}] 為以下這一則新聞生成【格式A：社群傳播版】的單則段落：
+
+{json.dumps(section_fields(item), ensure_ascii=False, indent=2)}
+
+請只輸出這一則的段落，結構如下（不要輸出最後總結）：
+
+{SECTION_STRUCTURE}
+
+格式要求：
+- 使用 emoji 突出分類與亮點
+- 語氣專業、簡潔，偏向產業觀點
+- 不要贅述背景故事，聚焦「新 → 有數據 → 有行動」"""
+
+
+def summary_prompt(sections, today):
+    joined = "\n\n".join(section_digest(s) for s in sections)
+    return f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
+
+以下是今天（{today}）社群貼文中 {len(sections)} 則新聞的分類標題與重點：
+
+{joined}
+
+請以繁體中文只輸出「最後總結」，結構如下：
+
+{SUMMARY_STRUCTURE}"""
+
+
+def assemble_sections(sections):
+    """標題 + 各則段落，最後總結接在其後"""
+    return HEADING + "\n\n" + "\n\n---\n\n".join(s.strip() for s in sections) + "\n\n---\n\n"
+
+
+def assemble(sections, summary):
+    return assemble_sections(sections) + summary.strip()
+
+
+class SectionCache:
+    """每則新聞的格式 A 段落，以內容雜湊為鍵，寫入 JSON 檔供重跑沿用"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.sections = read_json(self.path, default={}) or {}
+
+    def get(self, key):
+        with self.lock:
+            return self.sections.get(key)
+
+    def put(self, key, text):
+        with self.lock:
+            self.sections[key] = text
+            write_json(self.path, self.sections)
+
+
+def make_section(item, cache, generate, today):
+    """取得單則段落：快取命中直接回傳，否則生成後寫入快取"""
+    key = section_key(item)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    text = generate(section_prompt(item, today)).strip()
+    cache.put(key, text)
+    return text
+
+
+class Speculator:
+    """預先生成段落：背景只開一個執行緒，不和前景呼叫搶併發名額"""
+
+    def __init__(self, generate, cache, today):
+        self.generate = generate
+        self.cache = cache
+        self.today = today
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def _produce(self, item):
+        return make_section(item, self.cache, self.generate, self.today)
+
+    def start(self, candidates, top_n=12):
+        """依候選排序在背景排入前 top_n 則"""
+        queued = 0
+        with self.lock:
+            for item in candidates[:top_n]:
+                key = section_key(item)
+                future = self.futures.get(key)
+                if future is not None and not (future.done() and future.exception()):
+                    continue
+                if self.cache.get(key) is not None:
+                    continue
+                self.futures[key] = self.pool.submit(self._produce, item)
+                queued += 1
+        if queued:
+            print(f"🔮 背景預先生成 {queued} 則格式 A 段落")
+
+    def stop(self):
+        """取消尚未開始的預生成；進行中的會跑完並寫入快取"""
+        with self.lock:
+            for key, future in list(self.futures.items()):
+                if future.cancel():
+                    del self.futures[key]
+
+    def close(self):
+        """取消排隊中的預生成並關閉執行緒池，避免程式結束時還要等排隊的 LLM 呼叫跑完"""
+        self.stop()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def section(self, item):
+        """取得段落：已快取直接用，背景正在生成就等它完成，否則在呼叫端執行緒立即生成"""
+        key = section_key(item)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        with self.lock:
+            future = self.futures.get(key)
+            if future is not None and future.cancel():
+                del self.futures[key]
+                future = None
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass  # 背景失敗就改由前景重新生成
+        return self._produce(item)
+
+
+def build_format_a(items, section, summarize, workers=4, on_chunk=None):
+    """map：各則段落並行取得；reduce：以各段落摘要產生最後總結，最後依原順序組合
+
+    section(item) 回傳單則段落；summarize(段落清單, on_chunk) 回傳最後總結文字。
+    有 on_chunk 時，每則段落在它與前面各則都完成後立即送出，串流內容與最終文字順序一致。
+    """
+    if on_chunk:
+        on_chunk(HEADING + "\n\n")
+    sections = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+        for future in [pool.submit(section, item) for item in items]:
+            sections.append(future.result())
+            if on_chunk:
+                on_chunk(sections[-1].strip() + "\n\n---\n\n")
+    return assemble(sections, summarize(sections, on_chunk))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+階段 2 格式並行生成
+三種格式的提示詞互不相依，同時送出後總延遲接近最慢的一種，而不是三者相加。
+- 每種格式各自計時，逾時或失敗時重送（逾時的舊請求結果直接捨棄）
+- 每完成一種就呼叫 on_done，讓呼叫端立刻寫檔、更新進度
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import ensure_dir
+
+FORMAT_FILES = {
+    "format_a": "format_a_social_tw.md",
+    "format_b": "format_b_apa_tw.md",
+    "format_c": "format_c_design_tw.txt",
+}
+FORMAT_LABELS = {
+    "format_a": "格式 A: 社群傳播版",
+    "format_b": "格式 B: APA 引用格式",
+    "format_c": "格式 C: 視覺設計版",
+}
+
+
+def job_config(pipeline):
+    cfg = (pipeline or {}).get("stage2") or {}
+    return {
+        "timeout": float(cfg.get("timeout_seconds", 180)),
+        "retries": int(cfg.get("retries", 1)),
+    }
+
+
+def write_format(out_dir, name, text):
+    ensure_dir(str(out_dir))
+    path = os.path.join(str(out_dir), FORMAT_FILES[name])
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def run_format_jobs(jobs, timeout=180, retries=1, on_done=None):
+    """jobs 為 {名稱: 無參數函式}，並行執行後回傳 {名稱: 文字}，最終失敗者為 None
+
+    on_done(名稱, 文字或 None, 已完成數, 總數) 於每種格式完成（或放棄）時呼叫。
+    """
+    results = {}
+    attempts = {name: 0 for name in jobs}
+    pool = ThreadPoolExecutor(max_workers=len(jobs) * (retries + 1) or 1)
+    pending = {}
+
+    def start(name):
+        attempts[name] += 1
+        pending[pool.submit(jobs[name])] = (name, time.monotonic())
+
+    def finish(name, text, error=None):
+        if error is not None:
+            if attempts[name] <= retries:
+                print(f"⏳ {FORMAT_LABELS.get(name, name)} 失敗（{error}），重試第 {attempts[name]} 次")
+                start(name)
+                return
+            print(f"❌ {FORMAT_LABELS.get(name, name)} 生成失敗：{error}")
+        results[name] = text
+        if on_done:
+            on_done(name, text, len(results), len(jobs))
+
+    try:
+        for name in jobs:
+            start(name)
+        while pending:
+            now = time.monotonic()
+            left = min(started + timeout - now for _, started in pending.values())
+            done, _ = wait(list(pending), timeout=max(0.0, left), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = pending.pop(future)
+                try:
+                    finish(name, future.result().strip())
+                except Exception as ex:
+                    finish(name, None, ex)
+            now = time.monotonic()
+            for future, (name, started) in list(pending.items()):
+                if now - started >= timeout:
+                    # 執行緒無法中斷，逾時的請求讓它跑完但不採用結果
+                    pending.pop(future)
+                    future.cancel()
+                    finish(name, None, f"逾時 {timeout:.0f}s")
+    finally:
+        pool.shutdown(wait=False)
+    return {name: results.get(name) for name in jobs}
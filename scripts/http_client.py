@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+共用 HTTP 連線池
+每個主機共用一個 keep-alive Session，讓多執行緒收集器重用連線
+設定 HTTP_RECORD_DIR / HTTP_REPLAY_URL 可錄製或重播回應（見 http_replay.py）
+"""
+
+import os
+import time
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "ai-news-automation/1.0 (+https://github.com/ke22/ai-news-automation)"
+POOL_SIZE = 16
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """取得該主機專用的 Session（含連線池）"""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _sessions[host] = session
+    return session
+
+
+def http_get(url, params=None, headers=None, timeout=30):
+    """透過共用連線池發出 GET 請求"""
+    replay_url = os.getenv("HTTP_REPLAY_URL")
+    record_dir = os.getenv("HTTP_RECORD_DIR")
+    if replay_url or record_dir:
+        from scripts import http_replay
+
+        url = requests.Request("GET", url, params=params).prepare().url
+        params = None
+        if replay_url:
+            return http_replay.replay_request(replay_url, url, headers, timeout)
+    started = time.perf_counter()
+    r = get_session(url).get(url, params=params, headers=headers, timeout=timeout)
+    if record_dir:
+        http_replay.save_cassette(record_dir, url, r, time.perf_counter() - started)
+    return r
+
+
+def close_sessions():
+    """關閉所有連線池"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
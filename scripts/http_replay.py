@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+HTTP 錄製 / 重播
+- 錄製：設定 HTTP_RECORD_DIR=data/cassettes 後正常執行收集，每個 URL 的回應
+  （狀態碼、標頭、內容、延遲）存成一個 cassette
+- 重播：python scripts/http_replay.py serve 啟動本機伺服器，並設定
+  HTTP_REPLAY_URL=http://127.0.0.1:8765，所有 http_get 改由 cassette 回應，
+  可設定延遲、抖動與錯誤注入，不需網路即可重現與量測收集流程
+"""
+
+import os
+import sys
+import time
+import base64
+import random
+import argparse
+import threading
+from email.utils import parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import sha1, write_json, read_json, iso_now
+
+CASSETTE_DIR = "data/cassettes"
+# requests 已解壓內容，重播時不能再宣告壓縮或沿用原長度
+DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def cassette_path(directory, url):
+    return os.path.join(directory, f"{sha1(url)}.json")
+
+
+def save_cassette(directory, url, response, latency):
+    if response.status_code == 304:
+        # 保留上一次的完整回應，重播時由伺服器依驗證器回 304
+        return
+    write_json(
+        cassette_path(directory, url),
+        {
+            "url": url,
+            "recorded_at": iso_now(),
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() not in DROP_HEADERS
+            },
+            "body_b64": base64.b64encode(response.content).decode("ascii"),
+            "latency": round(latency, 4),
+        },
+    )
+
+
+def not_modified(headers, request_headers):
+    """依 cassette 的 ETag / Last-Modified 判斷條件式請求是否回 304；有 If-None-Match 時優先，不再看日期"""
+    lower = {k.lower(): v for k, v in headers.items()}
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match:
+        tags = {t.strip() for t in if_none_match.split(",")}
+        return "*" in tags or lower.get("etag") in tags
+    if_modified_since = request_headers.get("If-Modified-Since")
+    last_modified = lower.get("last-modified")
+    if not (if_modified_since and last_modified):
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def replay_request(replay_url, url, headers=None, timeout=30):
+    """把請求轉給重播伺服器（原始 URL 以查詢參數傳遞）"""
+    from scripts.http_client import get_session
+
+    return get_session(replay_url).get(
+        replay_url.rstrip("/") + "/replay",
+        params={"url": url},
+        headers=headers,
+        timeout=timeout,
+    )
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    cassettes = CASSETTE_DIR
+    latency = None
+    jitter = 0.0
+    error_rate = 0.0
+    rng = random.Random()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        url = (parse_qs(parts.query).get("url") or [""])[0]
+        cassette = read_json(cassette_path(self.cassettes, url)) if url else None
+        if cassette is None:
+            self.send_error(404, "no cassette")
+            return
+        delay = cassette.get("latency", 0) if self.latency is None else self.latency
+        delay += self.rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+        if self.rng.random() < self.error_rate:
+            self.send_error(503, "injected error")
+            return
+        headers = cassette.get("headers", {})
+        if not_modified(headers, self.headers):
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = base64.b64decode(cassette.get("body_b64", ""))
+        self.send_response(cassette.get("status", 200))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(
+    cassettes=CASSETTE_DIR, port=8765, latency=None, jitter=0.0, error_rate=0.0, seed=None
+):
+    """在背景執行緒啟動重播伺服器，回傳 (server, base_url)"""
+    handler = type(
+        "ConfiguredReplayHandler",
+        (ReplayHandler,),
+        {
+            "cassettes": cassettes,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "rng": random.Random(seed),
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HTTP 錄製 / 重播伺服器")
+    sub = ap.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="啟動重播伺服器")
+    serve.add_argument("--cassettes", default=CASSETTE_DIR)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument(
+        "--latency", type=float, default=None, help="固定延遲秒數（預設使用錄製時的延遲）"
+    )
+    serve.add_argument("--jitter", type=float, default=0.0, help="延遲隨機抖動 ±秒數")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="注入 503 的機率")
+    serve.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    server, base_url = start_server(
+        args.cassettes, args.port, args.latency, args.jitter, args.error_rate, args.seed
+    )
+    print(f"📼 重播伺服器已啟動：{base_url}（cassettes: {args.cassettes}）")
+    print(f"💡 export HTTP_REPLAY_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
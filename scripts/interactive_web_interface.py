@@ -9,11 +9,20 @@
 import os
 import sys
 import json
+import queue
 import threading
 import subprocess
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    jsonify,
+    send_file,
+    stream_with_context,
+)
 
 # 添加專案根目錄到 Python 路徑
 project_root = Path(__file__).parent.parent
@@ -21,6 +30,8 @@ sys.path.insert(0, str(project_root))
 
 from scripts.two_stage_workflow import TwoStageWorkflow
 from scripts.database_integration import DatabaseManager
+from scripts.vector_scoring import weighted_totals, top_k
+from scripts.format_jobs import FORMAT_LABELS
 
 app = Flask(__name__)
 
@@ -41,6 +52,41 @@ workflow_instance = None
 database_manager = None
 
 
+class EventHub:
+    """SSE 訂閱者佇列；階段 2 的生成片段即時推送給所有已連線的瀏覽器"""
+
+    def __init__(self, max_queued=2000):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.max_queued = max_queued
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queued)
+        with self.lock:
+            self.subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self.subscribers:
+                self.subscribers.remove(q)
+
+    def publish(self, event, data):
+        with self.lock:
+            for q in self.subscribers:
+                try:
+                    q.put_nowait((event, data))
+                except queue.Full:
+                    pass  # 跟不上的連線略過片段，格式完成時仍會收到完整文字
+
+
+event_hub = EventHub()
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
 @app.route("/")
 def index():
     """主頁面"""
@@ -61,11 +107,17 @@ def start_stage1():
 
         # 在背景執行階段 1
         def run_stage1():
+            global workflow_instance
             try:
+                # 重跑階段 1 時先停掉舊實例的預生成，避免為過期候選佔用 RPM 配額
+                if workflow_instance is not None:
+                    workflow_instance.speculator.close()
                 workflow_instance = TwoStageWorkflow()
                 success = workflow_instance.stage1_ai_selection()
 
                 if success:
+                    # 編輯挑選期間先在背景生成高分候選的格式 A 段落
+                    workflow_instance.start_speculation()
                     workflow_status["candidates"] = workflow_instance.candidates
                     workflow_status["stage"] = 3  # 直接跳到候選看板階段
                     workflow_status["current_step"] = "等待人工選擇"
@@ -181,18 +233,15 @@ def recalculate_scores_with_weights(weights):
     global workflow_instance, workflow_status
 
     try:
-        for candidate in workflow_instance.candidates:
-            # 重新計算總分
-            new_total = (
-                candidate["tech_score"] * weights["tech"] / 100
-                + candidate["impact_score"] * weights["impact"] / 100
-                + candidate["practical_score"] * weights["practical"] / 100
-                + candidate["timely_score"] * weights["timely"] / 100
-            )
-            candidate["total_score"] = round(new_total, 1)
+        candidates = workflow_instance.candidates
+        # 重新計算總分
+        totals = weighted_totals(candidates, weights)
+        for candidate, total in zip(candidates, totals):
+            candidate["total_score"] = float(total)
 
         # 重新排序
-        workflow_instance.candidates.sort(key=lambda x: x["total_score"], reverse=True)
+        order = top_k(totals, len(candidates))
+        workflow_instance.candidates = [candidates[i] for i in order]
 
         # 重新分配 ID
         for i, candidate in enumerate(workflow_instance.candidates):
@@ -224,27 +273,41 @@ def start_stage2():
         # 在背景執行階段 2
         def run_stage2():
             try:
-                # 更新進度
-                workflow_status["progress"] = 20
-                workflow_status["logs"].append("🔄 開始 AI 最終分析...")
-
-                # 生成三種格式
-                workflow_status["progress"] = 40
-                workflow_status["logs"].append("📝 生成格式 A: 社群傳播版...")
-                format_a = workflow_instance._generate_format_a()
-
-                workflow_status["progress"] = 60
-                workflow_status["logs"].append("📝 生成格式 B: APA 引用格式...")
-                format_b = workflow_instance._generate_format_b()
-
-                workflow_status["progress"] = 80
-                workflow_status["logs"].append("📝 生成格式 C: 視覺設計版...")
-                format_c = workflow_instance._generate_format_c()
+                workflow_status["progress"] = 5
+                workflow_status["logs"].append("🔄 開始 AI 最終分析，三種格式並行生成...")
+                workflow_status["results"] = {}
+
+                # 進度依實際完成的格式數推進（5% → 90%），完成的文字立即保存並推送
+                def on_progress(name, text, completed, total):
+                    workflow_status["progress"] = 5 + int(85 * completed / total)
+                    workflow_status["results"][name] = text
+                    event_hub.publish("format", {"format": name, "text": text})
+                    if text is None:
+                        workflow_status["logs"].append(f"❌ {FORMAT_LABELS[name]} 生成失敗")
+                    else:
+                        workflow_status["logs"].append(
+                            f"📝 {FORMAT_LABELS[name]} 完成（{completed}/{total}）"
+                        )
+
+                # 生成中的片段經 /api/stream 即時推送
+                def on_chunk(name, piece):
+                    if piece is None:
+                        event_hub.publish("reset", {"format": name})
+                    else:
+                        event_hub.publish("chunk", {"format": name, "text": piece})
+
+                formats = workflow_instance.generate_formats(on_progress, on_chunk)
+                if None in formats.values():
+                    raise RuntimeError("部分格式生成失敗，已完成的格式仍已儲存")
+                format_a, format_b, format_c = (
+                    formats["format_a"],
+                    formats["format_b"],
+                    formats["format_c"],
+                )
 
                 # 儲存結果
-                workflow_status["progress"] = 90
                 workflow_status["logs"].append("💾 儲存結果檔案...")
-                workflow_instance._save_results(format_a, format_b, format_c)
+                workflow_instance._save_summary(format_a, format_b, format_c)
 
                 # 儲存到資料庫
                 workflow_status["progress"] = 95
@@ -289,6 +352,42 @@ def get_status():
     return jsonify(workflow_status)
 
 
+@app.route("/api/stream")
+def stream_events():
+    """Server-Sent Events：狀態有變化才推送，並即時轉送階段 2 的生成片段，取代每秒輪詢 /api/status"""
+    subscriber = event_hub.subscribe()
+
+    def events():
+        last = None
+        idle = 0.0
+        try:
+            while True:
+                snapshot = json.dumps(workflow_status, ensure_ascii=False, default=str)
+                if snapshot != last:
+                    last = snapshot
+                    idle = 0.0
+                    yield f"event: status\ndata: {snapshot}\n\n"
+                try:
+                    event, data = subscriber.get(timeout=0.5)
+                except queue.Empty:
+                    idle += 0.5
+                    if idle >= 15:
+                        # 心跳：讓代理伺服器保持連線，也能偵測瀏覽器已離開
+                        idle = 0.0
+                        yield ": keepalive\n\n"
+                    continue
+                idle = 0.0
+                yield sse_message(event, data)
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/candidates")
 def get_candidates():
     """取得候選清單"""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+關鍵字評分引擎
+依 config/keywords.yaml 一次編譯：所有關鍵字先建成字首樹（trie），再轉成單一
+正規表示式交給 re 的 C 引擎比對，效果等同多模式自動機，每篇文章只掃描一次。
+比對有字邊界（"code" 不會命中 "decode"），並允許英文複數 s / es 結尾。
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import load_yaml, article_epoch
+
+KEYWORDS_PATH = "config/keywords.yaml"
+# 未在 keywords.yaml 的 points 指定時各組每個命中關鍵字的分數；timeliness 不計分
+DEFAULT_POINTS = {
+    "technical_breakthrough": 10,
+    "industry_impact": 8,
+    "practical_value": 7,
+}
+
+
+def _trie_pattern(node):
+    """把字首樹轉成正規表示式（共用字首只比對一次）"""
+    end = "" in node
+    parts = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not parts:
+        return ""
+    if len(parts) == 1 and not end:
+        return parts[0]
+    return "(?:" + "|".join(parts) + ")" + ("?" if end else "")
+
+
+def compile_keywords(words):
+    """編譯成單一模式：group 1 為命中的關鍵字本體（不含複數字尾）"""
+    root = {}
+    for word in words:
+        node = root
+        for ch in word.lower():
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    if not root:
+        return re.compile(r"(?!x)x")
+    return re.compile(r"(?<![a-z0-9])(" + _trie_pattern(root) + r")(?:e?s)?(?![a-z0-9])")
+
+
+class KeywordScorer:
+    def __init__(self, weights, points=None, boost_publishers=(), boost_points=2):
+        self.points = dict(DEFAULT_POINTS, **(points or {}))
+        self.groups = list(weights)
+        self.group_of = {}
+        for group, words in weights.items():
+            for w in words or []:
+                self.group_of.setdefault(w.lower(), set()).add(group)
+        self.pattern = compile_keywords(self.group_of)
+        self.publisher_pattern = compile_keywords(boost_publishers)
+        self.boost_points = boost_points
+
+    @classmethod
+    def from_config(cls, path=KEYWORDS_PATH):
+        kw = load_yaml(path) or {}
+        return cls(
+            kw.get("weights", {}),
+            kw.get("points"),
+            kw.get("boost_publishers", []),
+            kw.get("boost_points", 2),
+        )
+
+    def matches(self, text):
+        """命中的關鍵字集合（每個關鍵字只算一次）"""
+        return set(self.pattern.findall(text.lower()))
+
+    def hits(self, text):
+        """各組命中的關鍵字數"""
+        counts = dict.fromkeys(self.groups, 0)
+        for word in self.matches(text):
+            for group in self.group_of[word]:
+                counts[group] += 1
+        return counts
+
+    def keyword_score(self, text):
+        return sum(self.points.get(g, 0) * n for g, n in self.hits(text).items())
+
+    def is_boosted(self, source):
+        return self.publisher_pattern.search((source or "").lower()) is not None
+
+    def score(self, item, now=None):
+        """與 process.rule_score 相同的規則：關鍵字 + 新鮮度 + 發布者加權"""
+        now = now or datetime.now(timezone.utc).timestamp()
+        text = f"{item.get('title') or ''} {item.get('summary') or ''}"
+        score = self.keyword_score(text)
+        pub = article_epoch(item)
+        if pub is not None:
+            score += max(0, 5 - int((now - pub) // 86400))
+        else:
+            score += 1
+        if self.is_boosted(item.get("source", "")):
+            score += self.boost_points
+        return score
+
+    def score_many(self, items):
+        now = datetime.now(timezone.utc).timestamp()
+        return [self.score(it, now) for it in items]
+
+
+@lru_cache(maxsize=4)
+def _load_scorer(path, mtime):
+    return KeywordScorer.from_config(path)
+
+
+def get_scorer(path=KEYWORDS_PATH):
+    """整個執行期間共用一個編譯好的評分器，keywords.yaml 修改後自動重建"""
+    return _load_scorer(path, os.path.getmtime(path))
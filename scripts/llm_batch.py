@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+批次 LLM 評分
+把多則新聞打包進同一個提示詞，要求模型回傳以 id 對應的 JSON 陣列；
+回應逐筆驗證，缺漏或格式錯誤的項目重新排入下一輪（批次縮小），
+批次大小依輸入 / 輸出 token 估計自動調整，200 則只需少數幾次呼叫。
+有傳入 cache（llm_cache.ItemCache）時逐則查快取，只送未命中的項目，驗證通過才寫回。
+"""
+
+import os
+import re
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import estimate_tokens
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+# 兩段式流程與半自動流程共用的候選評分欄位
+CANDIDATE_SCHEMA = """{
+    "category": "模型發布/AI開發工具/企業應用/重大融資/研究突破",
+    "key_point": "一句重點（≤30字）",
+    "key_data": "關鍵數據（最多3個「指標:數值」；缺則寫「—」）",
+    "tech_score": 0-5,
+    "impact_score": 0-5,
+    "practical_score": 0-5,
+    "timely_score": 0-5,
+    "total_score": "四項加權求和，保留1位小數",
+    "hours_ago": "距今幾小時"
+}"""
+SCORE_KEYS = ("tech_score", "impact_score", "practical_score", "timely_score")
+
+
+def extract_json(text):
+    """從模型回應取出 JSON（容許 ``` 圍欄與前後說明文字）"""
+    text = (text or "").strip()
+    fenced = FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    for open_ch, close_ch in (("[", "]"), ("{", "}")):
+        start, end = text.find(open_ch), text.rfind(close_ch)
+        if 0 <= start < end:
+            try:
+                return json.loads(text[start : end + 1])
+            except ValueError:
+                continue
+    return None
+
+
+def split_response(text):
+    """把 JSON 陣列回應拆成 {id: 物件}"""
+    data = extract_json(text)
+    if isinstance(data, dict):
+        # 有些模型會包一層 {"results": [...]} 或直接以 id 為鍵
+        data = next((v for v in data.values() if isinstance(v, list)), None) or [
+            dict(v, id=k) for k, v in data.items() if isinstance(v, dict)
+        ]
+    if not isinstance(data, list):
+        return {}
+    return {str(e["id"]): e for e in data if isinstance(e, dict) and "id" in e}
+
+
+def plan_batches(rendered, max_items, max_input_tokens, output_tokens_per_item, max_output_tokens):
+    """依 token 預算把 [(id, 文字)] 切成批次"""
+    per_batch = max(1, min(max_items, max_output_tokens // max(1, output_tokens_per_item)))
+    batches, current, used = [], [], 0
+    for key, text in rendered:
+        cost = estimate_tokens(text)
+        if current and (len(current) >= per_batch or used + cost > max_input_tokens):
+            batches.append(current)
+            current, used = [], 0
+        current.append((key, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_prompt(header, schema, batch):
+    items = "\n\n".join(f"[{key}]\n{text}" for key, text in batch)
+    return f"""{header}
+
+以下共有 {len(batch)} 則新聞，每則以 [id] 標示：
+
+{items}
+
+請只輸出一個 JSON 陣列，每則新聞一個物件，依上方順序，且每個物件都必須包含 "id"（與 [id] 相同），其餘欄位如下：
+{schema}"""
+
+
+def score_in_batches(
+    items,
+    render,
+    header,
+    schema,
+    generate,
+    validate,
+    max_items=20,
+    max_input_tokens=6000,
+    max_output_tokens=4000,
+    output_tokens_per_item=60,
+    max_rounds=3,
+    workers=1,
+    stats=None,
+    cache=None,
+):
+    """批次評分，回傳與 items 對齊的清單（驗證失敗者為 None）
+
+    render(item) 產生單則文字，generate(prompt) 回傳模型文字，
+    validate(entry) 回傳整理後的結果或 None。批次內以序號當 id，避免模型抄錯長雜湊。
+    workers > 1 時同一輪的批次併發送出（限流由 LLMClient 負責）；
+    傳入 stats 字典時會填入呼叫次數、輪數與成功筆數；
+    傳入 cache 時以「header + schema + 單則文字」逐則快取，快取內容重新驗證後才採用。
+    """
+    results = [None] * len(items)
+    pending = []
+    keys = {}
+    for i, it in enumerate(items):
+        text = render(it)
+        if cache is not None:
+            keys[str(i + 1)] = cache.key(header, schema, text)
+            entry = cache.get(keys[str(i + 1)])
+            value = validate(entry) if entry is not None else None
+            if value is not None:
+                results[i] = value
+                continue
+        pending.append((str(i + 1), text))
+    cached = len(items) - len(pending)
+    calls = 0
+    round_no = -1
+
+    def run(batch):
+        try:
+            return split_response(generate(batch_prompt(header, schema, batch)))
+        except Exception as ex:
+            print(f"⚠️ 批次評分失敗（{len(batch)} 則）：{ex}")
+            return {}
+
+    for round_no in range(max_rounds if pending else 0):
+        retry = []
+        batches = plan_batches(
+            pending, max_items, max_input_tokens, output_tokens_per_item, max_output_tokens
+        )
+        calls += len(batches)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            responses = list(pool.map(run, batches))
+        for batch, entries in zip(batches, responses):
+            for key, text in batch:
+                entry = entries.get(key)
+                if entry is not None:
+                    # 批次序號只用來對應回應，不能蓋掉文章本身的 id
+                    entry = {k: v for k, v in entry.items() if k != "id"}
+                value = validate(entry) if entry is not None else None
+                if value is None:
+                    retry.append((key, text))
+                else:
+                    results[int(key) - 1] = value
+                    if cache is not None:
+                        cache.put(keys[key], entry)
+        if not retry or round_no == max_rounds - 1:
+            break
+        print(f"🔁 {len(retry)} 則缺漏或格式錯誤，重新送出")
+        pending = retry
+        # 缺漏多半是輸出被截斷，下一輪縮小批次
+        max_items = max(1, max_items // 2)
+    done = sum(r is not None for r in results)
+    print(f"🤖 批次評分：{done}/{len(items)} 則（快取 {cached} 則），共 {calls} 次呼叫")
+    if stats is not None:
+        stats.update(llm_calls=calls, llm_rounds=round_no + 1, llm_scored=done, llm_cached=cached)
+    return results
+
+
+def batch_config(pipeline=None, **defaults):
+    """pipeline.yaml 的 llm_batch 設定，直接作為 score_in_batches 的關鍵字參數
+
+    defaults 為呼叫端的預設值（如 output_tokens_per_item），設定檔有同名鍵時以設定檔為準。
+    """
+    return dict(defaults, **((pipeline or {}).get("llm_batch") or {}))
+
+
+
+def validate_candidate(entry):
+    """檢查候選評分欄位，分數需為 0-5 的數字；不合格回傳 None"""
+    try:
+        scores = {k: float(entry[k]) for k in SCORE_KEYS}
+        total = float(entry.get("total_score", sum(scores.values()) / len(scores)))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not all(0 <= v <= 5 for v in scores.values()) or not entry.get("category"):
+        return None
+    return dict(entry, total_score=total)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+LLM 回應快取
+以 SQLite（data/cache/llm.sqlite）保存 generate_content 的結果，
+鍵為 sha256(模型名稱 + 生成設定 + 正規化後的提示詞)。
+- TTL：超過 ttl_hours 的結果視為過期
+- 大小上限：超過 max_entries 時淘汰最久未使用的項目（LRU）
+- 命中 / 未命中計數，設定 LLM_CACHE_BYPASS=1 可略過讀取（仍會寫入新結果）
+- ItemCache：批次評分逐則快取，鍵只含單則文字與共用的指示 / 欄位，
+  批次組合不同也能命中，且只存通過驗證的結果
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import dataclasses
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import ensure_dir
+
+CACHE_PATH = "data/cache/llm.sqlite"
+
+
+def normalize_prompt(prompt):
+    """只差在空白與換行的提示詞視為相同"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def config_dict(generation_config):
+    if generation_config is None:
+        return {}
+    if isinstance(generation_config, dict):
+        return generation_config
+    if dataclasses.is_dataclass(generation_config):
+        return dataclasses.asdict(generation_config)
+    return {k: v for k, v in vars(generation_config).items() if not k.startswith("_")}
+
+
+def cache_key(model, generation_config, prompt):
+    payload = json.dumps(
+        [model, config_dict(generation_config), normalize_prompt(prompt)],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, ttl_hours=72, max_entries=20000, bypass=False):
+        self.path = path
+        self.ttl = float(ttl_hours) * 3600
+        self.max_entries = int(max_entries)
+        self.bypass = bypass or os.getenv("LLM_CACHE_BYPASS", "") not in ("", "0")
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._db = None
+
+    @classmethod
+    def from_config(cls, cfg=None):
+        cfg = dict(cfg or {})
+        if not cfg.pop("enabled", True):
+            return None
+        return cls(**cfg)
+
+    @property
+    def db(self):
+        if self._db is None:
+            ensure_dir(os.path.dirname(self.path))
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, text TEXT, created REAL, last_used REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used ON responses (last_used)"
+            )
+        return self._db
+
+    def get(self, key):
+        """命中時回傳文字；過期、不存在或 bypass 時回傳 None"""
+        if self.bypass:
+            with self.lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT text, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, model, text):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, text, now, now),
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now):
+        self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        (count,) = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self):
+        with self.lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class ItemCache:
+    """score_in_batches 的逐則快取，綁定模型與生成設定；存的是模型回傳的原始欄位（不含批次 id）"""
+
+    def __init__(self, cache, model, generation_config=None):
+        self.cache = cache
+        self.model = model
+        self.generation_config = generation_config
+
+    def key(self, header, schema, text):
+        return cache_key(self.model, self.generation_config, f"{header}\n{schema}\n{text}")
+
+    def get(self, key):
+        text = self.cache.get(key)
+        if text is None:
+            return None
+        try:
+            entry = json.loads(text)
+        except ValueError:
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def put(self, key, entry):
+        entry = {k: v for k, v in entry.items() if k != "id"}
+        self.cache.put(key, self.model, json.dumps(entry, ensure_ascii=False))
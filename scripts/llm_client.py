@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+共用 LLM 用戶端
+- 所有 Gemini 呼叫經由同一個 LLMClient；呼叫端各自以執行緒併發，由 AIMD 名額統一控管
+- RPM / TPM 令牌桶存於 data/state/llm_bucket.json，以檔案鎖跨行程共享，
+  cron 與 Web 介面同時執行也不會一起超過配額
+- 429 / 暫時性錯誤以指數退避 + 隨機抖動重試
+- 併發數採 AIMD：成功逐步加一，遇到 429 減半
+- 有設定 llm_cache 時先查回應快取（見 llm_cache.py），命中即不送出請求；
+  批次評分改用 item_cache() 逐則快取，整批提示詞不進快取
+- 給 on_chunk 時改用串流回應，邊生成邊回呼，完整文字仍照常快取
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只在行程內共享
+    fcntl = None
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import ensure_dir, load_yaml, estimate_tokens
+from scripts.llm_cache import LLMCache, ItemCache, cache_key
+
+STATE_PATH = "data/state/llm_bucket.json"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """每分鐘請求數與 token 數的令牌桶，狀態以檔案鎖跨行程共享"""
+
+    def __init__(self, rpm=15, tpm=1000000, state_path=STATE_PATH):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.state_path = state_path
+        self.lock = threading.Lock()
+
+    def _update(self, fn):
+        """在鎖內讀出狀態、套用 fn、寫回，回傳 fn 的結果"""
+        ensure_dir(os.path.dirname(self.state_path) or ".")
+        with self.lock, open(self.state_path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+                result = fn(state)
+                tmp = self.state_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.state_path)
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["requests"] = min(self.rpm, state.get("requests", self.rpm) + elapsed * self.rpm / 60)
+        state["tokens"] = min(self.tpm, state.get("tokens", self.tpm) + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    def try_acquire(self, tokens):
+        """成功扣除時回傳 0，否則回傳建議等待秒數"""
+        tokens = min(tokens, self.tpm)
+
+        def take(state):
+            now = time.time()
+            self._refill(state, now)
+            blocked = state.get("blocked_until", 0) - now
+            if blocked > 0:
+                return blocked
+            if state["requests"] >= 1 and state["tokens"] >= tokens:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0.0
+            need_requests = (1 - state["requests"]) * 60 / self.rpm
+            need_tokens = (tokens - state["tokens"]) * 60 / self.tpm
+            return max(need_requests, need_tokens, 0.05)
+
+        return self._update(take)
+
+    def acquire(self, tokens):
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait + random.uniform(0, 0.1))
+
+    def block(self, seconds):
+        """收到 429 時讓所有共用此桶的行程暫停一段時間"""
+
+        def extend(state):
+            state["blocked_until"] = max(state.get("blocked_until", 0), time.time() + seconds)
+
+        self._update(extend)
+
+
+class LLMResponse:
+    """與 genai 回應相容的最小介面（.text）"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def chunk_text(chunk):
+    """串流片段的文字；被安全過濾或沒有內容的片段存取 .text 會拋 ValueError"""
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+def is_retryable(ex):
+    code = getattr(ex, "code", None) or getattr(ex, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    name = type(ex).__name__
+    text = str(ex)
+    return name in ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded") or (
+        "429" in text or "quota" in text.lower()
+    )
+
+
+def is_rate_limited(ex):
+    code = getattr(ex, "code", None) or getattr(ex, "status_code", None)
+    return code == 429 or type(ex).__name__ == "ResourceExhausted" or "429" in str(ex)
+
+
+class LLMClient:
+    def __init__(
+        self,
+        model=None,
+        api_key=None,
+        rpm=15,
+        tpm=1000000,
+        max_concurrency=4,
+        initial_concurrency=2,
+        max_retries=5,
+        backoff_base=2.0,
+        backoff_max=60.0,
+        output_tokens=800,
+        state_path=STATE_PATH,
+        cache=None,
+    ):
+        import google.generativeai as genai
+
+        self.genai = genai
+        self.model_name = os.getenv("GEMINI_MODEL") or model or "gemini-1.5-flash"
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY 未設定")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+        self.bucket = TokenBucket(rpm, tpm, state_path)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(min(self.max_concurrency, max(1, initial_concurrency)))
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.output_tokens = output_tokens
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, cfg=None, cache=None):
+        return cls(cache=cache, **(cfg or {}))
+
+    def _enter(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def _leave(self, ok):
+        with self.cond:
+            self.in_flight -= 1
+            if ok:
+                # 加法增加：約每完成「目前併發數」個請求多開一個名額
+                self.limit = min(self.max_concurrency, self.limit + 1 / max(1.0, self.limit))
+            else:
+                self.limit = max(1.0, self.limit / 2)
+            self.cond.notify_all()
+
+    def _config(self, generation_config, temperature):
+        if generation_config is None and temperature is not None:
+            generation_config = self.genai.types.GenerationConfig(temperature=temperature)
+        return generation_config
+
+    def generate_content(
+        self, prompt, generation_config=None, temperature=None, on_chunk=None, use_cache=True
+    ):
+        """與 GenerativeModel.generate_content 相同用法，加上限流、退避與併發控制
+
+        給 on_chunk 時以 stream=True 送出，每收到一段文字就呼叫 on_chunk(片段)；
+        已送出片段後才失敗的請求不重試，避免呼叫端收到重複內容。
+        use_cache=False 時不查也不寫整份提示詞的快取（批次評分由 item_cache 逐則快取）。
+        """
+        config = self._config(generation_config, temperature)
+        key = cache_key(self.model_name, config, prompt) if self.cache and use_cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                if on_chunk:
+                    on_chunk(cached)
+                return LLMResponse(cached)
+        tokens = estimate_tokens(prompt) + self.output_tokens
+        emitted = False
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(tokens)
+            self._enter()
+            try:
+                if on_chunk is None:
+                    text = self.model.generate_content(prompt, generation_config=config).text
+                else:
+                    parts = []
+                    stream = self.model.generate_content(
+                        prompt, generation_config=config, stream=True
+                    )
+                    for chunk in stream:
+                        piece = chunk_text(chunk)
+                        if piece:
+                            parts.append(piece)
+                            emitted = True
+                            on_chunk(piece)
+                    text = "".join(parts)
+            except Exception as ex:
+                limited = is_rate_limited(ex)
+                self._leave(ok=not limited)
+                if attempt == self.max_retries or emitted or not is_retryable(ex):
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+                if limited:
+                    self.bucket.block(delay)
+                print(f"⏳ LLM 暫時失敗（{type(ex).__name__}），{delay:.1f}s 後重試")
+                time.sleep(delay)
+                continue
+            self._leave(ok=True)
+            if key:
+                self.cache.put(key, self.model_name, text)
+            return LLMResponse(text)
+
+    def generate(self, prompt, temperature=None, generation_config=None, use_cache=True):
+        return self.generate_content(
+            prompt, generation_config, temperature, use_cache=use_cache
+        ).text
+
+    def item_cache(self, temperature=None, generation_config=None):
+        """給 score_in_batches 的逐則快取；未啟用快取時回傳 None"""
+        if not self.cache:
+            return None
+        config = self._config(generation_config, temperature)
+        return ItemCache(self.cache, self.model_name, config)
+
+    def report(self):
+        if self.cache:
+            st = self.cache.stats()
+            print(
+                f"💾 LLM 快取：命中 {st['hits']}、未命中 {st['misses']}"
+                f"（命中率 {st['hit_rate']:.0%}）"
+            )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(pipeline=None):
+    """整個行程共用一個用戶端，讓 AIMD、限流與快取狀態一致"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if pipeline is None:
+                pipeline = load_yaml("config/pipeline.yaml") or {}
+            cache = LLMCache.from_config(pipeline.get("llm_cache"))
+            _client = LLMClient.from_config(pipeline.get("llm"), cache)
+        return _client
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+近似重複新聞偵測
+- URL 正規化（去除 utm_* 等追蹤參數、AMP 版本、結尾斜線）
+- 標題與摘要的 shingle → MinHash 簽章 → LSH 分桶，只比對同桶候選，維持次二次方複雜度
+- 以 union-find 合併成群，群組 ID 由最早發布的成員決定，重跑結果穩定
+"""
+
+import os
+import re
+import sys
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import numpy as np
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import sha1
+
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "cmpid",
+    "ocid",
+    "smid",
+    "taid",
+    "guccounter",
+    "guce_referrer",
+    "guce_referrer_sig",
+    "outputtype",
+    "amp",
+}
+_AMP_PATH = re.compile(r"(/amp|\.amp)(?=/?$)")
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+")
+
+_PRIME = (1 << 31) - 1
+
+
+def canonical_url(url):
+    """URL 正規化：同一篇文章的追蹤參數版、AMP 版、行動版應得到相同結果"""
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = parts.netloc.lower()
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    path = _AMP_PATH.sub("", parts.path).rstrip("/")
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def shingles(article, title_k=5, summary_words=40):
+    """標題取字元 k-gram、摘要取前段的詞 3-gram，標題權重較高"""
+    title = " ".join(_WORD.findall((article.get("title") or "").lower()))
+    out = {title[i : i + title_k] for i in range(max(1, len(title) - title_k + 1))}
+    words = _WORD.findall(_TAG.sub(" ", article.get("summary") or "").lower())
+    words = words[:summary_words]
+    out.update(" ".join(words[i : i + 3]) for i in range(len(words) - 2))
+    out.discard("")
+    return out
+
+
+class NearDupIndex:
+    """MinHash + LSH 的增量索引，add() 時即回傳所屬群組 ID"""
+
+    def __init__(self, threshold=0.5, num_perm=64, bands=16, seed=42):
+        assert num_perm % bands == 0
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = {}
+        self.by_url = {}
+        self.signatures = []
+        self.parent = []
+        self.cluster_ids = []
+
+    def signature(self, article):
+        sh = shingles(article)
+        if not sh:
+            return None
+        x = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & _PRIME for s in sh),
+            dtype=np.uint64,
+            count=len(sh),
+        )
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+    def _find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def _union(self, i, j):
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            # 較早加入者為根，群組 ID 因此固定為最早成員
+            if rj < ri:
+                ri, rj = rj, ri
+            self.parent[rj] = ri
+
+    def _band_keys(self, sig):
+        return [
+            (band, sig[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _matches(self, article, sig):
+        """網址相同，或 LSH 同桶且 MinHash 相似度達門檻的既有索引"""
+        matches = []
+        url = canonical_url(article.get("url"))
+        if url in self.by_url:
+            matches.append(self.by_url[url])
+        if sig is not None:
+            candidates = set()
+            for key in self._band_keys(sig):
+                candidates.update(self.buckets.get(key, ()))
+            for j in candidates:
+                if float(np.mean(self.signatures[j] == sig)) >= self.threshold:
+                    matches.append(j)
+        return matches
+
+    def find(self, article):
+        """不加入索引，回傳相符群組的代表索引（沒有則為 None）"""
+        matches = self._matches(article, self.signature(article))
+        return min((self._find(j) for j in matches), default=None)
+
+    def add(self, article):
+        idx = len(self.parent)
+        self.parent.append(idx)
+        key = article.get("id") or article.get("url") or article.get("title")
+        self.cluster_ids.append("c" + sha1(key or str(idx))[:10])
+        sig = self.signature(article)
+        for j in self._matches(article, sig):
+            self._union(j, idx)
+        self.signatures.append(sig)
+        url = canonical_url(article.get("url"))
+        if url and url not in self.by_url:
+            self.by_url[url] = idx
+        if sig is not None:
+            for key in self._band_keys(sig):
+                self.buckets.setdefault(key, []).append(idx)
+        return self.cluster_id(idx)
+
+    def cluster_id(self, idx):
+        return self.cluster_ids[self._find(idx)]
+
+    def is_representative(self, idx):
+        return self._find(idx) == idx
+
+
+def cluster_articles(articles, threshold=0.5):
+    """為每則新聞標上 cluster_id（不刪除），回傳 (articles, 是否為群組代表)"""
+    order = sorted(
+        range(len(articles)),
+        key=lambda i: (articles[i].get("published_at") or "", articles[i].get("id") or ""),
+    )
+    index = NearDupIndex(threshold=threshold)
+    position = {}
+    for i in order:
+        position[i] = len(index.parent)
+        index.add(articles[i])
+    for i, a in enumerate(articles):
+        a["cluster_id"] = index.cluster_id(position[i])
+    return articles, [index.is_representative(position[i]) for i in range(len(articles))]
+
+
+def collapse_near_duplicates(articles, threshold=0.5):
+    """每個群組只保留最早發布的一則，其餘來源記錄在 duplicates 欄位"""
+    articles, is_rep = cluster_articles(articles, threshold)
+    reps = {a["cluster_id"]: a for a, rep in zip(articles, is_rep) if rep}
+    for a, rep in zip(articles, is_rep):
+        if not rep:
+            reps[a["cluster_id"]].setdefault("duplicates", []).append(
+                {"source": a.get("source", ""), "url": a.get("url", "")}
+            )
+    return [a for a, rep in zip(articles, is_rep) if rep]
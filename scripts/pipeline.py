@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+串流處理管線
+來源 → 去重 → 已見過濾 → 評分 → Top-K，每一段都是產生器：
+- 來源每完成一個工作就交出文章，後續評分不必等所有來源下載完
+- 近似去重用增量的 NearDupIndex，可設定視窗讓多日回補維持固定記憶體
+- 選取以大小為 K 的 heap 完成，不需整體排序
+用法：
+  python scripts/pipeline.py --collect               # 增量收集（寫入當日資料、推進水位）並選出 Top 20
+  python scripts/pipeline.py --days 30 --top 50      # 回補最近 30 天的原始資料
+"""
+
+import os
+import sys
+import heapq
+import argparse
+from datetime import datetime, timedelta
+from itertools import count, islice
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import TZ, load_yaml, iter_raw_articles, today_path
+from scripts.near_dedup import NearDupIndex
+from scripts.keyword_matcher import get_scorer
+from scripts.vector_scoring import rule_scores
+
+
+def stream_sources(cfg, incremental=False, guard=None, seen=None, base=None):
+    """並行收集，每個來源工作完成就逐則產出文章
+
+    增量模式與 collect.py --incremental 相同：每完成一個來源就把水位之後的新文章
+    追加到 base 的 raw_news.jsonl、推進該來源水位並登記已見索引，只產出新文章。
+    """
+    from scripts.collect import build_tasks, iter_tasks, append_incremental
+
+    tasks = build_tasks(cfg, incremental)
+    for _, batch, _, _ in iter_tasks(tasks, cfg, guard):
+        if incremental:
+            timings = {batch["source"]: batch["seconds"]}
+            yield from append_incremental(base, [batch], cfg, timings, seen)
+        else:
+            yield from batch["articles"]
+
+
+def stream_days(days, end=None):
+    """依日期由舊到新逐則讀取 data/YYYY/MM/DD 的原始資料（JSONL 逐行讀取）"""
+    end = end or datetime.now(TZ)
+    for offset in range(days - 1, -1, -1):
+        day = (end - timedelta(days=offset)).strftime("%Y/%m/%d")
+        yield from iter_raw_articles(f"data/{day}")
+
+
+# 去重索引每代保留的文章數；只和最近 window～2×window 則比較，記憶體不隨串流長度成長
+DEFAULT_WINDOW = 50000
+
+
+class StreamDedup:
+    """串流近似去重：新群組的第一則才往下游送，之後的重複來源記到它的 duplicates
+
+    以兩代索引輪替，只和最近 window～2×window 則比較，記憶體固定；window=None 時不輪替。
+    """
+
+    def __init__(self, threshold=0.5, window=DEFAULT_WINDOW):
+        self.threshold = threshold
+        self.window = window
+        self.current = NearDupIndex(threshold=threshold)
+        self.previous = None
+        self.reps = {}
+        self.previous_reps = {}
+        self.dropped = 0
+
+    def _rotate(self):
+        self.previous, self.previous_reps = self.current, self.reps
+        self.current, self.reps = NearDupIndex(threshold=self.threshold), {}
+
+    def _check(self, article):
+        """回傳 (群組 ID, 既有代表文章)；新群組時代表為 None"""
+        if self.previous is not None:
+            idx = self.previous.find(article)
+            if idx is not None:
+                cluster_id = self.previous.cluster_id(idx)
+                return cluster_id, self.previous_reps.get(cluster_id)
+        idx = len(self.current.parent)
+        cluster_id = self.current.add(article)
+        if self.current.is_representative(idx):
+            return cluster_id, None
+        return cluster_id, self.reps.get(cluster_id)
+
+    def __call__(self, articles):
+        for article in articles:
+            cluster_id, rep = self._check(article)
+            if rep is None:
+                article["cluster_id"] = cluster_id
+                self.reps[cluster_id] = article
+                yield article
+            else:
+                self.dropped += 1
+                rep.setdefault("duplicates", []).append(
+                    {"source": article.get("source", ""), "url": article.get("url", "")}
+                )
+            if self.window and len(self.current.parent) >= self.window:
+                self._rotate()
+
+
+def filter_seen(articles, seen, before=None, flush_every=500):
+    """略過先前已收集過的文章，新文章分批寫入已見索引"""
+    pending = []
+    for article in articles:
+        first = seen.first_seen(article["id"])
+        if first is not None and (before is None or first < before):
+            continue
+        pending.append(article["id"])
+        if len(pending) >= flush_every:
+            seen.add(pending)
+            pending = []
+        yield article
+    if pending:
+        seen.add(pending)
+
+
+def score_stream(articles, chunk=256):
+    """產出 (規則分數, 文章)；每 chunk 則以欄位運算評分一次，chunk=1 時逐則評分"""
+    if chunk <= 1:
+        scorer = get_scorer()
+        for article in articles:
+            yield scorer.score(article), article
+        return
+    articles = iter(articles)
+    while True:
+        block = list(islice(articles, chunk))
+        if not block:
+            return
+        yield from zip(rule_scores(block).tolist(), block)
+
+
+def select_top(scored, k=20):
+    """以大小為 k 的 min-heap 選出最高分者（同分保留先到的），由高到低回傳 [(分數, 文章)]；k=None 時全部排序"""
+    heap = []
+    seq = count()
+    for score, article in scored:
+        entry = (score, -next(seq), article)
+        if k is None or len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [(score, article) for score, _, article in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
+def run(articles, k=20, seen=None, before=None, dedup=True, window=DEFAULT_WINDOW, chunk=256):
+    """串接各段並回傳 Top-K [(分數, 文章)]"""
+    if dedup:
+        articles = StreamDedup(window=window)(articles)
+    if seen is not None:
+        articles = filter_seen(articles, seen, before)
+    return select_top(score_stream(articles, chunk), k)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="串流處理管線")
+    ap.add_argument("--collect", action="store_true", help="即時收集（預設讀取已存的原始資料）")
+    ap.add_argument("--days", type=int, default=1, help="回補最近幾天的原始資料")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="去重視窗大小（則）")
+    args = ap.parse_args(argv)
+
+    seen = guard = None
+    if args.collect:
+        from scripts.collect import open_guard
+        from scripts.seen_index import open_seen_index
+
+        pipeline = load_yaml("config/pipeline.yaml") or {}
+        seen = open_seen_index(pipeline.get("seen_index"))
+        guard = open_guard()
+        articles = stream_sources(
+            load_yaml("config/sources.yaml"), True, guard, seen, f"data/{today_path()}"
+        )
+    else:
+        articles = stream_days(args.days)
+    try:
+        for i, (score, a) in enumerate(run(articles, args.top, window=args.window), 1):
+            print(f"{i:>3}. [{score:>3}] {a.get('title', '')[:80]}（{a.get('source', '')}）")
+    finally:
+        if guard is not None:
+            guard.save()
+        if seen is not None:
+            seen.evict()
+            seen.save()
+
+
+if __name__ == "__main__":
+    main()
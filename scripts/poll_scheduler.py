@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+自適應輪詢排程
+依各 feed 實際的發文間隔估計更新頻率，以優先佇列（heap）安排下一次輪詢：
+忙碌的 feed 縮短間隔，沒有新文章的 feed 逐步退避
+"""
+
+import os
+import sys
+import time
+import heapq
+from datetime import datetime
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import read_json, write_json
+
+STATE_PATH = "data/state/poll_schedule.json"
+
+
+def entry_gaps(articles, limit=20):
+    """最近 limit 則文章相鄰發布時間的間隔（秒）"""
+    stamps = []
+    for a in articles:
+        try:
+            stamps.append(datetime.fromisoformat(a["published_at"]).timestamp())
+        except (KeyError, TypeError, ValueError):
+            continue
+    stamps = sorted(stamps)[-limit:]
+    return [b - a for a, b in zip(stamps, stamps[1:]) if b > a]
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        keys,
+        min_interval=300,
+        max_interval=6 * 3600,
+        default_interval=1800,
+        backoff=1.5,
+        smoothing=0.3,
+        min_interval_by_key=None,
+        state_path=STATE_PATH,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.min_interval_by_key = min_interval_by_key or {}
+        self.state_path = state_path
+        saved = read_json(state_path, default={})
+        now = time.time()
+        self.state = {}
+        self.heap = []
+        for key in keys:
+            st = saved.get(key) or {
+                "interval": default_interval,
+                "gap": None,
+                "next_due": now,
+            }
+            self.state[key] = st
+            heapq.heappush(self.heap, (st["next_due"], key))
+
+    def _clamp(self, key, seconds):
+        low = max(self.min_interval, self.min_interval_by_key.get(key, 0))
+        return min(self.max_interval, max(low, seconds))
+
+    def seconds_until_next(self, now=None):
+        if not self.heap:
+            return self.max_interval
+        return max(0.0, self.heap[0][0] - (now or time.time()))
+
+    def pop_due(self, now=None):
+        now = now or time.time()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, key = heapq.heappop(self.heap)
+            due.append(key)
+        return due
+
+    def record(self, key, articles, new_count, now=None):
+        """依本次結果更新間隔並排入下一次輪詢"""
+        now = now or time.time()
+        st = self.state[key]
+        gaps = entry_gaps(articles)
+        if gaps:
+            gap = sorted(gaps)[len(gaps) // 2]
+            st["gap"] = (
+                gap
+                if st["gap"] is None
+                else self.smoothing * gap + (1 - self.smoothing) * st["gap"]
+            )
+        if new_count:
+            # 以約半個發文間隔輪詢一次，新文章平均延遲約為間隔的四分之一
+            target = st["gap"] / 2 if st["gap"] else st["interval"] / self.backoff
+        else:
+            target = st["interval"] * self.backoff
+        st["interval"] = self._clamp(key, target)
+        st["next_due"] = now + st["interval"]
+        heapq.heappush(self.heap, (st["next_due"], key))
+
+    def save(self):
+        write_json(self.state_path, self.state)
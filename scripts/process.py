@@ -1,42 +1,38 @@
 #!/usr/bin/env python
 import os
 import sys
-import json
-from datetime import datetime, timezone
-from dateutil import parser as dtparser
 
 # Add project root to Python path for imports
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from scripts.utils import today_path, write_json, read_json, load_yaml, to_display_date
+from scripts.utils import (
+    today_path,
+    write_json,
+    load_yaml,
+    to_display_date,
+    iter_raw_articles,
+)
+from scripts.seen_index import open_seen_index
+from scripts.extract import best_summary
+from scripts.keyword_matcher import get_scorer
+from scripts.vector_scoring import blend_scores, top_k
+from scripts.pipeline import score_stream, select_top
+from scripts.llm_batch import score_in_batches, batch_config
+from scripts.llm_client import get_client
 
 
 def rule_score(item):
-    kw = load_yaml("config/keywords.yaml")
-    title = (item.get("title") or "").lower()
-    summary = (item.get("summary") or "").lower()
-    text = f"{title} {summary}"
-    score = 0
-    for k in kw["weights"]["technical_breakthrough"]:
-        if k.lower() in text:
-            score += 10
-    for k in kw["weights"]["industry_impact"]:
-        if k.lower() in text:
-            score += 8
-    for k in kw["weights"]["practical_value"]:
-        if k.lower() in text:
-            score += 7
+    return get_scorer().score(item)
+
+
+def refine_total(entry):
+    """四項評分加總；缺欄位、非整數或超出 1~5 分時回傳 None 以便重新送出"""
     try:
-        pub = dtparser.parse(item["published_at"]).replace(tzinfo=timezone.utc)
-        age = (datetime.now(timezone.utc) - pub).days
-        score += max(0, 5 - age)
-    except Exception:
-        score += 1
-    boosts = [b.lower() for b in kw.get("boost_publishers", [])]
-    if any(b in (item.get("source", "").lower()) for b in boosts):
-        score += 2
-    return score
+        scores = [int(entry[k]) for k in ("tech", "impact", "practical", "timely")]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return sum(scores) if all(1 <= s <= 5 for s in scores) else None
 
 
 def ai_refine(items):
@@ -44,37 +40,27 @@ def ai_refine(items):
     if not api_key:
         return [None] * len(items)
     try:
-        import google.generativeai as genai
-
-        genai.configure(api_key=api_key)
-        model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        gen_model = genai.GenerativeModel(model)
-        refined = []
-        for it in items:
-            prompt = f"""你將只輸出 JSON，且內容極簡。
-
-請針對下列 AI 新聞依規則給出 1~5 分四項評分（tech/impact/practical/timely）：
-標題：{it['title']}
-摘要：{it.get('summary','')}
+        client = get_client()
+
+        def render(it):
+            return f"""標題：{it['title']}
+摘要：{best_summary(it)}
 來源：{it.get('source','')}
-時間：{it.get('published_at','')}
-
-輸出 JSON：{{"tech":x,"impact":x,"practical":x,"timely":x}}"""
-            response = gen_model.generate_content(
-                prompt, generation_config=genai.types.GenerationConfig(temperature=0.2)
-            )
-            content = response.text.strip()
-            try:
-                data = json.loads(content)
-                s = (
-                    int(data.get("tech", 0))
-                    + int(data.get("impact", 0))
-                    + int(data.get("practical", 0))
-                    + int(data.get("timely", 0))
-                )
-                refined.append(s)
-            except Exception:
-                refined.append(None)
+時間：{it.get('published_at','')}"""
+
+        refined = score_in_batches(
+            items,
+            render,
+            "你將只輸出 JSON，且內容極簡。\n\n"
+            "請針對下列 AI 新聞依規則逐則給出 1~5 分四項評分（tech/impact/practical/timely）。",
+            '{"tech":x,"impact":x,"practical":x,"timely":x}',
+            lambda prompt: client.generate(prompt, temperature=0.2, use_cache=False),
+            refine_total,
+            workers=client.max_concurrency,
+            cache=client.item_cache(temperature=0.2),
+            **batch_config(load_yaml("config/pipeline.yaml")),
+        )
+        client.report()
         return refined
     except Exception as ex:
         print("Gemini 失敗：", ex)
@@ -106,22 +92,31 @@ def generate_formats(selected):
     return fmt_a, fmt_b, fmt_c
 
 
+def refine_top_k(pipeline):
+    """送 AI 精煉的則數；未設定（或 0）時全部送出，與串流化之前相同"""
+    k = int(((pipeline or {}).get("process") or {}).get("refine_top_k") or 0)
+    return max(20, k) if k > 0 else None
+
+
 def main():
     date_path = today_path()
     base = f"data/{date_path}"
-    items = read_json(f"{base}/raw_news.json", default=[])
-    if not items:
+    pipeline = load_yaml("config/pipeline.yaml") or {}
+    # 逐則讀取並評分；設定 process.refine_top_k 時只以 heap 保留規則分數前 K 則送 AI 精煉
+    ranked = select_top(score_stream(iter_raw_articles(base)), refine_top_k(pipeline))
+    if not ranked:
         print("❗找不到原始資料，請先執行 collect.py")
         return
-    scored = [(rule_score(it), it) for it in items]
-    refined = ai_refine([it for _, it in scored])
-    for idx, (s, it) in enumerate(scored):
-        if refined[idx] is not None:
-            s = int(round(0.6 * s + 0.8 * refined[idx]))
-        scored[idx] = (s, it)
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [it for _, it in scored[:20]]
+    scores = [score for score, _ in ranked]
+    items = [it for _, it in ranked]
+    refined = ai_refine(items)
+    totals = blend_scores(scores, refined)
+    top = [items[i] for i in top_k(totals, 20)]
     write_json(f"{base}/selected.json", top)
+    seen = open_seen_index(pipeline.get("seen_index"))
+    if seen is not None:
+        seen.mark_published(it["id"] for it in top if it.get("id"))
+        seen.save()
     fmt_a, fmt_b, fmt_c = generate_formats(top)
     out_dir = f"content/{date_path}"
     os.makedirs(out_dir, exist_ok=True)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+格式 B（APA 7 引用）與格式 C（視覺設計版）本地產生
+兩者都只是把既有欄位（來源、日期、標題、URL、類別、重點）套進固定格式，
+不需要 LLM，結果即時且每次相同。
+- APA：無作者時標題移到作者位置；缺日期寫 (n.d.)；缺來源以網域代替
+- 設計版：第 1 行類別、第 2 行精煉重點；重點過長直接在本地截短，
+  只有缺類別或重點的項目才在有提供 generate 時打包成一次 LLM 補齊
+"""
+
+import os
+import sys
+from urllib.parse import urlsplit
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import to_display_date
+from scripts.llm_batch import score_in_batches
+
+MONTHS = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+
+POLISH_SCHEMA = '{"category": "模型發布/AI開發工具/企業應用/重大融資/研究突破", "headline": "精煉重點（10–15字）"}'
+
+
+def site_name(item):
+    source = (item.get("source") or "").strip()
+    if source:
+        return source
+    host = urlsplit(item.get("url") or "").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def apa_date(item):
+    date = to_display_date(item.get("published_at") or "")
+    try:
+        year, month, day = (int(x) for x in date.split("-"))
+        return f"({year}, {MONTHS[month - 1]} {day})"
+    except (ValueError, IndexError):
+        return "(n.d.)"
+
+
+def _sentence(text):
+    text = " ".join((text or "").split()).rstrip(".")
+    return text if text.endswith(("?", "!", "？", "！")) else text + "."
+
+
+def apa_reference(item):
+    """Author. (Year, Month Day). Title. Site. URL；無作者時以標題開頭"""
+    title = _sentence(item.get("title") or "Untitled")
+    site = site_name(item)
+    author = (item.get("author") or "").strip()
+    parts = [_sentence(author), apa_date(item) + ".", title] if author else [title, apa_date(item) + "."]
+    # 網站名稱與作者相同時 APA 省略網站名稱
+    if site and site != author:
+        parts.append(_sentence(site))
+    if item.get("url"):
+        parts.append(item["url"])
+    return " ".join(parts)
+
+
+def render_apa(items):
+    """參考文獻依第一個元素字母排序（APA 7）"""
+    refs = [apa_reference(it) for it in items]
+    return "\n".join(sorted(refs, key=str.casefold))
+
+
+def clip(text, max_chars):
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+def needs_polish(item):
+    """候選的 key_point 上限 30 字，比設計版長是常態，過長只截短，不為此呼叫 LLM"""
+    return not item.get("category") or not (item.get("key_point") or "").strip()
+
+
+def polish(items, generate, max_chars=15, cache=None):
+    """缺資料的項目打包成一次 LLM 呼叫，回傳每則 {"category", "headline"} 或 None；cache 為逐則快取"""
+
+    def render(it):
+        return f"""標題：{it.get('title', '')}
+摘要：{(it.get('summary') or '')[:300]}
+現有類別：{it.get('category') or '—'}
+現有重點：{it.get('key_point') or '—'}"""
+
+    def validate(entry):
+        headline = entry.get("headline")
+        if not isinstance(headline, str) or not 0 < len(headline.strip()) <= max_chars:
+            return None
+        return {"category": entry.get("category") or "", "headline": headline.strip()}
+
+    return score_in_batches(
+        items,
+        render,
+        f"請為以下新聞補上類別，並把重點精煉成 {max_chars} 字以內的一句話（繁體中文）。",
+        POLISH_SCHEMA,
+        generate,
+        validate,
+        output_tokens_per_item=40,
+        cache=cache,
+    )
+
+
+def design_entry(item, max_chars=15):
+    category = (item.get("category") or "其他").strip()
+    return f"{category}\n{clip(item.get('key_point') or item.get('title'), max_chars)}"
+
+
+def render_design(items, generate=None, max_chars=15, cache=None):
+    """每則兩行，則與則之間空一行；generate 為 None 時完全不呼叫 LLM"""
+    items = [dict(it) for it in items]
+    missing = [it for it in items if needs_polish(it)]
+    if missing and generate is not None:
+        try:
+            results = polish(missing, generate, max_chars, cache)
+        except Exception as ex:
+            print(f"⚠️ 設計版精煉失敗，改用截短：{ex}")
+            results = [None] * len(missing)
+        for it, data in zip(missing, results):
+            if data:
+                it["category"] = it.get("category") or data.get("category")
+                it["key_point"] = data["headline"]
+    return "\n\n".join(design_entry(it, max_chars) for it in items)
+
+
+def renderer_config(pipeline):
+    cfg = (pipeline or {}).get("renderers") or {}
+    return {
+        "polish": bool(cfg.get("polish", True)),
+        "max_chars": int(cfg.get("headline_max_chars", 15)),
+    }
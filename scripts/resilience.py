@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+收集來源的韌性控制
+- 每個來源保留最近的延遲樣本，以 p99 決定逾時
+- 連續失敗達門檻即斷路，冷卻後以單一半開探測決定是否恢復
+- 超過 p95 仍未回應時送出一個對沖（hedged）請求，取先完成者
+狀態存於 data/state/resilience.json，跨次執行延續
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import read_json, write_json
+
+STATE_PATH = "data/state/resilience.json"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Resilience:
+    def __init__(
+        self,
+        window=50,
+        min_samples=10,
+        timeout_factor=2.0,
+        min_timeout=3.0,
+        max_timeout=30.0,
+        failure_threshold=3,
+        cooldown=900,
+        hedge=True,
+        no_hedge=(),
+        state_path=STATE_PATH,
+    ):
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.no_hedge = set(no_hedge)
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.sources = {}
+        for key, st in (read_json(state_path, default={}) or {}).items():
+            self.sources[key] = dict(st, samples=deque(st.get("samples", []), maxlen=window))
+
+    @classmethod
+    def from_config(cls, cfg=None):
+        cfg = dict(cfg or {})
+        if not cfg.pop("enabled", True):
+            return None
+        return cls(**cfg)
+
+    def _state(self, key):
+        st = self.sources.get(key)
+        if st is None:
+            st = {
+                "samples": deque(maxlen=self.window),
+                "failures": 0,
+                "state": "closed",
+                "opened_at": 0.0,
+            }
+            self.sources[key] = st
+        return st
+
+    def timeout_for(self, key):
+        """有足夠樣本時以 p99 × 倍數作為逾時，否則回傳 None（沿用呼叫端預設）"""
+        with self.lock:
+            samples = list(self._state(key)["samples"])
+        if len(samples) < self.min_samples:
+            return None
+        p99 = percentile(samples, 0.99) * self.timeout_factor
+        return min(self.max_timeout, max(self.min_timeout, p99))
+
+    def hedge_after(self, key):
+        if not self.hedge or key in self.no_hedge:
+            return None
+        with self.lock:
+            samples = list(self._state(key)["samples"])
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, 0.95)
+
+    def allow(self, key):
+        with self.lock:
+            st = self._state(key)
+            if st["state"] == "closed":
+                return True
+            if st["state"] == "open" and time.time() - st["opened_at"] >= self.cooldown:
+                st["state"] = "half_open"
+                return True
+            return False
+
+    def record_success(self, key, latency):
+        with self.lock:
+            st = self._state(key)
+            st["samples"].append(round(latency, 4))
+            st["failures"] = 0
+            st["state"] = "closed"
+
+    def record_failure(self, key):
+        with self.lock:
+            st = self._state(key)
+            st["failures"] += 1
+            if st["state"] == "half_open" or st["failures"] >= self.failure_threshold:
+                st["state"] = "open"
+                st["opened_at"] = time.time()
+
+    def call(self, key, fn):
+        """以韌性控制執行 fn(timeout=...)；斷路中拋出 CircuitOpenError"""
+        if not self.allow(key):
+            raise CircuitOpenError(f"{key} 斷路中")
+        timeout = self.timeout_for(key)
+        kwargs = {"timeout": timeout} if timeout else {}
+        hedge_after = self.hedge_after(key)
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            futures = [pool.submit(fn, **kwargs)]
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                # 主請求已超過 p95，送出對沖請求
+                futures.append(pool.submit(fn, **kwargs))
+            error = None
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut.exception() is None:
+                        self.record_success(key, time.perf_counter() - started)
+                        return fut.result()
+                    error = fut.exception()
+            self.record_failure(key)
+            raise error
+        finally:
+            # 不等待落後的對沖請求，它會在自身逾時內結束
+            pool.shutdown(wait=False)
+
+    def summary(self):
+        with self.lock:
+            return {
+                key: st["state"] for key, st in self.sources.items() if st["state"] != "closed"
+            }
+
+    def save(self):
+        with self.lock:
+            data = {
+                key: dict(st, samples=list(st["samples"])) for key, st in self.sources.items()
+            }
+        write_json(self.state_path, data)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+跨日已見文章索引
+- Bloom filter：常駐記憶體，絕大多數新文章在這一步就確定「沒見過」
+- SQLite 精確表：Bloom 判定可能見過時才查詢，並依最後出現時間淘汰舊資料
+以 normalize_article 產生的 sha1 id 為鍵
+"""
+
+import os
+import sys
+import math
+import sqlite3
+from datetime import datetime, timedelta
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import TZ, sha1, iso_now, ensure_dir
+
+STATE_DIR = "data/state"
+
+
+class BloomFilter:
+    def __init__(self, capacity=200000, error_rate=0.01):
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # 以 sha1 的兩段 64 位元做 double hashing
+        try:
+            h = int(key, 16)
+        except ValueError:
+            h = int(sha1(key), 16)
+        h1, h2 = h & 0xFFFFFFFFFFFFFFFF, (h >> 64) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class SeenIndex:
+    def __init__(self, name="seen", capacity=200000, error_rate=0.01, max_age_days=30):
+        self.bloom_path = os.path.join(STATE_DIR, f"{name}.bloom")
+        self.db_path = os.path.join(STATE_DIR, f"{name}.sqlite")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_age_days = max_age_days
+        self._db = None
+        self.bloom = self._load_bloom()
+
+    def _load_bloom(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        fresh_file = os.path.exists(self.bloom_path) and (
+            not os.path.exists(self.db_path)
+            or os.path.getmtime(self.bloom_path) >= os.path.getmtime(self.db_path)
+        )
+        if fresh_file:
+            with open(self.bloom_path, "rb") as f:
+                bits = bytearray(f.read())
+            if len(bits) == len(bloom.bits):
+                bloom.bits = bits
+                return bloom
+        if os.path.exists(self.db_path):
+            # 參數變更、檔案遺失或上次未正常存檔時由精確表重建
+            for (article_id,) in self.db.execute("SELECT id FROM seen"):
+                bloom.add(article_id)
+        return bloom
+
+    @property
+    def db(self):
+        if self._db is None:
+            ensure_dir(STATE_DIR)
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                "id TEXT PRIMARY KEY, first_seen TEXT, last_seen TEXT, status TEXT)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS seen_last ON seen (last_seen)"
+            )
+        return self._db
+
+    def first_seen(self, article_id):
+        """回傳首次見到的時間；確定沒見過則回傳 None"""
+        if article_id not in self.bloom:
+            return None
+        row = self.db.execute(
+            "SELECT first_seen FROM seen WHERE id = ?", (article_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def split(self, articles, before=None):
+        """分成 (新文章, 已見文章)；指定 before 時只把在該時間前就見過的視為已見"""
+        fresh, stale = [], []
+        for a in articles:
+            first = self.first_seen(a["id"])
+            if first is not None and (before is None or first < before):
+                stale.append(a)
+            else:
+                fresh.append(a)
+        return fresh, stale
+
+    def add(self, ids, status="collected"):
+        now = iso_now()
+        rows = []
+        for article_id in ids:
+            self.bloom.add(article_id)
+            rows.append((article_id, now, now, status))
+        self.db.executemany(
+            "INSERT INTO seen (id, first_seen, last_seen, status) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen, "
+            "status = CASE WHEN seen.status = 'published' THEN seen.status "
+            "ELSE excluded.status END",
+            rows,
+        )
+        self.db.commit()
+
+    def mark_published(self, ids):
+        self.add(ids, status="published")
+
+    def evict(self):
+        """淘汰超過 max_age_days 未再出現的文章，並重建 Bloom filter"""
+        cutoff = (datetime.now(TZ) - timedelta(days=self.max_age_days)).isoformat()
+        removed = self.db.execute("DELETE FROM seen WHERE last_seen < ?", (cutoff,))
+        self.db.commit()
+        if removed.rowcount:
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for (article_id,) in self.db.execute("SELECT id FROM seen"):
+                self.bloom.add(article_id)
+        return removed.rowcount
+
+    def save(self):
+        ensure_dir(STATE_DIR)
+        tmp = self.bloom_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.bloom.bits)
+        os.replace(tmp, self.bloom_path)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def open_seen_index(cfg=None):
+    """依 config/pipeline.yaml 的 seen_index 設定開啟索引；停用時回傳 None"""
+    cfg = cfg or {}
+    if not cfg.get("enabled", True):
+        return None
+    return SeenIndex(
+        capacity=int(cfg.get("capacity", 200000)),
+        error_rate=float(cfg.get("error_rate", 0.01)),
+        max_age_days=int(cfg.get("max_age_days", 30)),
+    )
+
+
+def today_start():
+    """今日 0 點（UTC），用來區分「今天稍早」與「前幾天」見過的文章"""
+    return datetime.now(TZ).replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
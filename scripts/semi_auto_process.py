@@ -6,7 +6,7 @@
 
 import os
 import sys
-import json
+import time
 from datetime import datetime, timezone
 from dateutil import parser as dtparser
 
@@ -14,14 +14,32 @@ from dateutil import parser as dtparser
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from scripts.utils import today_path, write_json, read_json, load_yaml, to_display_date
+from scripts.utils import (
+    today_path,
+    write_json,
+    load_yaml,
+    to_display_date,
+    load_raw_articles,
+)
+from scripts.llm_batch import (
+    score_in_batches,
+    batch_config,
+    CANDIDATE_SCHEMA,
+    validate_candidate,
+)
+from scripts.llm_client import get_client
+from scripts.cascade import prefilter, record_cascade
+from scripts.story_cluster import group_stories
+from scripts.format_jobs import run_format_jobs, job_config, write_format, FORMAT_LABELS
+from scripts.format_a import SectionCache, make_section, build_format_a, summary_prompt
+from scripts.renderers import render_apa, render_design, renderer_config
 
 
 def load_articles():
     """載入原始新聞資料"""
     date_path = today_path()
     base = f"data/{date_path}"
-    items = read_json(f"{base}/raw_news.json", default=[])
+    items = load_raw_articles(base)
     return items
 
 
@@ -33,51 +51,48 @@ def ai_initial_scoring(items):
         return []
 
     try:
-        import google.generativeai as genai
-
-        genai.configure(api_key=api_key)
-        model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        gen_model = genai.GenerativeModel(model)
+        client = get_client()
 
         print("🤖 AI 正在進行初步評分與分類...")
 
-        scored_items = []
-        for i, item in enumerate(items[:20]):  # 限制前20篇
-            prompt = f"""你是一位專業的 AI 產業內容策展人。
-
-請對以下新聞進行評分與分類：
+        pipeline = load_yaml("config/pipeline.yaml") or {}
+        # 同一事件的多篇報導只評分一則代表，其餘併入代表的 duplicates
+        items, stories = group_stories(items, pipeline.get("story_cluster"))
+        # 全部文章先以規則分數排序，只把預算內的前 K 篇送 AI
+        items, cascade = prefilter(items, pipeline, client.max_concurrency)
+        cascade.update(stories)
+        started = time.perf_counter()
 
-標題：{item['title']}
+        def render(item):
+            return f"""標題：{item['title']}
 摘要：{item.get('summary', '')}
 來源：{item.get('source', '')}
-時間：{item.get('published_at', '')}
-
-請輸出 JSON 格式：
-{{
-    "category": "模型發布/AI開發工具/企業應用/重大融資/研究突破",
-    "key_point": "一句重點（≤30字）",
-    "key_data": "關鍵數據（最多3個「指標:數值」；缺則寫「—」）",
-    "tech_score": 0-5,
-    "impact_score": 0-5,
-    "practical_score": 0-5,
-    "timely_score": 0-5,
-    "total_score": "四項加權求和，保留1位小數",
-    "hours_ago": "距今幾小時",
-    "cluster_id": "同題相同ID（如果與其他新聞相同）"
-}}"""
-
-            response = gen_model.generate_content(
-                prompt, generation_config=genai.types.GenerationConfig(temperature=0.2)
-            )
+時間：{item.get('published_at', '')}"""
+
+        results = score_in_batches(
+            items,
+            render,
+            "你是一位專業的 AI 產業內容策展人。\n\n請對以下新聞逐則進行評分與分類。",
+            CANDIDATE_SCHEMA,
+            lambda prompt: client.generate(prompt, temperature=0.2, use_cache=False),
+            validate_candidate,
+            workers=client.max_concurrency,
+            stats=cascade,
+            cache=client.item_cache(temperature=0.2),
+            **batch_config(pipeline, output_tokens_per_item=150),
+        )
+        cascade["llm_seconds"] = round(time.perf_counter() - started, 3)
+        record_cascade("semi_auto", cascade)
+        client.report()
 
-            try:
-                data = json.loads(response.text.strip())
-                scored_item = {"id": i + 1, "original": item, "ai_analysis": data}
-                scored_items.append(scored_item)
-                print(f"✅ 已評分第 {i+1} 篇")
-            except Exception as e:
-                print(f"❌ 第 {i+1} 篇評分失敗: {e}")
+        scored_items = []
+        for i, (item, data) in enumerate(zip(items, results)):
+            if data is None:
+                print(f"❌ 第 {i+1} 篇評分失敗")
                 continue
+            # 群組 ID 由本地事件聚類決定，不再交給 LLM 猜測
+            data["cluster_id"] = item.get("cluster_id", f"cluster_{i}")
+            scored_items.append({"id": i + 1, "original": item, "ai_analysis": data})
 
         return scored_items
 
@@ -137,96 +152,58 @@ def ai_final_analysis(selected_items):
         return None
 
     try:
-        import google.generativeai as genai
-
-        genai.configure(api_key=api_key)
-        model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        gen_model = genai.GenerativeModel(model)
+        client = get_client()
 
         print("🤖 AI 正在進行最終分析與格式化...")
 
-        # 準備選中的新聞資料
-        selected_data = []
-        for item in selected_items:
-            selected_data.append(
-                {
-                    "title": item["original"]["title"],
-                    "summary": item["original"].get("summary", ""),
-                    "source": item["original"].get("source", ""),
-                    "url": item["original"]["url"],
-                    "published_at": item["original"]["published_at"],
-                    "ai_analysis": item["ai_analysis"],
-                }
+        # 候選原始欄位與 AI 評分欄位合併成一層，供各格式使用
+        selected_data = [dict(it["original"], **it["ai_analysis"]) for it in selected_items]
+        pipeline = load_yaml("config/pipeline.yaml") or {}
+
+        # 格式A：社群傳播版，每則段落並行生成並快取，再以段落摘要產生最後總結
+        out_dir = f"content/{today_path()}"
+        today = today_path().replace("/", "-")
+        sections = SectionCache(f"{out_dir}/format_a_sections.json")
+
+        def section(item):
+            return make_section(
+                item,
+                sections,
+                lambda prompt: client.generate(prompt, temperature=0.3),
+                today,
             )
 
-        # 生成格式A：社群傳播版
-        format_a_prompt = f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
-請以繁體中文、時區 Asia/Taipei，為以下 {len(selected_data)} 則 AI 新聞產出【格式A：社群傳播版】。
-
-新聞資料：
-{json.dumps(selected_data, ensure_ascii=False, indent=2)}
-
-請按照以下格式輸出：
-
-🏷️【分類】新聞標題
-💡一句話重點（≤20字）
-摘要（120–150字）：核心事實 + 2–3關鍵訊息 + 影響範圍
-
-關鍵洞察：
-* 技術突破：X
-* 實務影響：X
-* 行動建議：X
-
-創新實踐者反思：
-→ 跨界連結：X
-→ 實踐路徑：X
-→ 核心啟發：X
-
----
-
-📊 最後總結
-【今日三大趨勢】：列3點（每點≤20字）
-【金句洞察】：1句
-【立即行動】：角色＋時間＋具體行動＋量化效果
-
-使用 emoji 突出分類與亮點，語氣專業、簡潔，偏向產業觀點。"""
-
-        response_a = gen_model.generate_content(
-            format_a_prompt,
-            generation_config=genai.types.GenerationConfig(temperature=0.3),
-        )
-
-        # 生成格式B：APA引用格式
-        format_b_prompt = f"""請為以下新聞生成【格式B：APA 7 引用格式】：
-
-{json.dumps(selected_data, ensure_ascii=False, indent=2)}
-
-格式：Author. (Year, Month Day). Title. Publisher/Source. URL"""
-
-        response_b = gen_model.generate_content(
-            format_b_prompt,
-            generation_config=genai.types.GenerationConfig(temperature=0.1),
-        )
-
-        # 生成格式C：視覺設計版
-        format_c_prompt = f"""請為以下新聞生成【格式C：視覺設計版】：
-
-{json.dumps(selected_data, ensure_ascii=False, indent=2)}
-
-每則兩行：
-第1行：[類別]
-第2行：[精煉重點10–15字]"""
-
-        response_c = gen_model.generate_content(
-            format_c_prompt,
-            generation_config=genai.types.GenerationConfig(temperature=0.2),
+        def summarize(parts, on_chunk=None):
+            return client.generate(summary_prompt(parts, today), temperature=0.3).strip()
+
+        # 格式B / C 由本地產生，只有缺資料的設計版項目才請 LLM 精煉
+        design = renderer_config(pipeline)
+        polish = None
+        if design["polish"]:
+            polish = lambda prompt: client.generate(prompt, temperature=0.2, use_cache=False)
+
+        # 三種格式並行生成，每完成一種就寫檔
+        def done(name, text, completed, total):
+            if text is not None:
+                write_format(out_dir, name, text)
+                print(f"📝 {FORMAT_LABELS[name]} 完成（{completed}/{total}）")
+
+        formats = run_format_jobs(
+            {
+                "format_a": lambda: build_format_a(
+                    selected_data, section, summarize, client.max_concurrency
+                ),
+                "format_b": lambda: render_apa(selected_data),
+                "format_c": lambda: render_design(
+                    selected_data, polish, design["max_chars"], client.item_cache(temperature=0.2)
+                ),
+            },
+            on_done=done,
+            **job_config(pipeline),
         )
-
-        return {
-            "format_a": response_a.text.strip(),
-            "format_b": response_b.text.strip(),
-            "format_c": response_c.text.strip(),
-        }
+        if None in formats.values():
+            return None
+        return formats
 
     except Exception as ex:
         print(f"❌ AI 最終分析失敗：{ex}")
@@ -239,17 +216,9 @@ def save_results(formats, selected_items):
     out_dir = f"content/{date_path}"
     os.makedirs(out_dir, exist_ok=True)
 
-    # 儲存格式A：社群傳播版
-    with open(f"{out_dir}/format_a_social_tw.md", "w", encoding="utf-8") as f:
-        f.write(formats["format_a"])
-
-    # 儲存格式B：APA引用格式
-    with open(f"{out_dir}/format_b_apa_tw.md", "w", encoding="utf-8") as f:
-        f.write(formats["format_b"])
-
-    # 儲存格式C：視覺設計版
-    with open(f"{out_dir}/format_c_design_tw.txt", "w", encoding="utf-8") as f:
-        f.write(formats["format_c"])
+    # 三種格式（ai_final_analysis 已逐一寫入，這裡確保與傳入內容一致）
+    for name, text in formats.items():
+        write_format(out_dir, name, text)
 
     # 儲存選中的項目資料
     write_json(f"{out_dir}/selected_items.json", selected_items)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+本地事件聚類
+同一事件常由多家媒體各自報導，內容並非近似重複（near_dedup 抓不到），
+但只需要送一則給 LLM 評分，其餘報導併入代表的 duplicates。
+- 標題（權重 ×2）與摘要前段取詞（英文去字尾、中文字 2-gram），雜湊到固定維度後算 TF-IDF
+- 以 SimHash（隨機 ±1 投影）簽章分段分桶，只對同桶候選算精確餘弦相似度
+- 相似度 ≥ threshold 以 union-find 合併，群組 ID 由最早發布的成員決定，重跑結果穩定
+"""
+
+import os
+import re
+import sys
+import zlib
+
+import numpy as np
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import sha1
+from scripts.vector_scoring import rule_scores
+
+_TAG = re.compile(r"<[^>]+>")
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*|[㐀-鿿]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "for", "with",
+    "at", "by", "from", "as", "is", "are", "was", "were", "be", "been", "it",
+    "its", "this", "that", "these", "those", "new", "says", "said", "will",
+    "has", "have", "had", "not", "can", "could", "how", "what", "why", "you",
+    "your", "we", "our", "they", "their", "he", "she", "his", "her", "after",
+    "about", "into", "over", "more", "than", "up", "out", "just", "now",
+}
+
+
+_SUFFIX = re.compile(r"(?<=[a-z]{3})(?:ing|ed|es|s)$")
+
+
+def _words(text):
+    """英文詞去掉常見字尾（launches / launched → launch），中文連續字切成 2-gram"""
+    out = []
+    for w in _TOKEN.findall(text.lower()):
+        if w in STOPWORDS:
+            continue
+        if "㐀" <= w[0] <= "鿿":
+            out.extend(w[i : i + 2] for i in range(max(1, len(w) - 1)))
+        else:
+            out.append(_SUFFIX.sub("", w))
+    return out
+
+
+def tokens(article, summary_words=60):
+    """標題詞權重加倍；摘要只取前段，避免長內文稀釋事件本身的關鍵詞"""
+    grams = []
+    summary = _words(_TAG.sub(" ", article.get("summary") or ""))[:summary_words]
+    for words, weight in ((_words(article.get("title") or ""), 2), (summary, 1)):
+        grams.extend(words * weight)
+    return grams
+
+
+def tfidf_vectors(articles, dim_bits=20):
+    """回傳每則的稀疏向量 (欄位索引, 權重)，欄位已排序、權重已 L2 正規化"""
+    mask = (1 << dim_bits) - 1
+    docs = []
+    for a in articles:
+        hashed = np.fromiter(
+            (zlib.crc32(t.encode("utf-8")) & mask for t in tokens(a)), dtype=np.int64
+        )
+        docs.append(np.unique(hashed, return_counts=True))
+    if not docs:
+        return []
+    vocab, df = np.unique(np.concatenate([cols for cols, _ in docs]), return_counts=True)
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1
+    vectors = []
+    for cols, counts in docs:
+        w = (1 + np.log(counts)) * idf[np.searchsorted(vocab, cols)]
+        norm = np.linalg.norm(w)
+        vectors.append((cols, w / norm if norm else w))
+    return vectors
+
+
+def _splitmix64(x):
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _signs(cols, bits, seed):
+    """每個欄位固定的 ±1 投影向量（由欄位雜湊推得，與語料無關）"""
+    words = bits // 64
+    keys = cols.astype(np.uint64)[:, None] * np.uint64(words) + np.arange(words, dtype=np.uint64)
+    raw = _splitmix64(keys + np.uint64(seed))
+    flags = np.unpackbits(raw.view(np.uint8).reshape(len(cols), -1), axis=1, bitorder="little")
+    return flags.astype(np.float64) * 2 - 1
+
+
+def simhash(vectors, bits=128, seed=42):
+    """每則向量的 SimHash 簽章（n × bits 布林矩陣）"""
+    out = np.zeros((len(vectors), bits), dtype=bool)
+    for i, (cols, w) in enumerate(vectors):
+        if len(cols):
+            out[i] = w @ _signs(cols, bits, seed) > 0
+    return out
+
+
+def cosine(u, v):
+    _, iu, iv = np.intersect1d(u[0], v[0], assume_unique=True, return_indices=True)
+    return float(u[1][iu] @ v[1][iv])
+
+
+def cluster_stories(articles, threshold=0.4, bits=128, band_bits=6, dim_bits=20):
+    """為每則新聞標上事件層級的 cluster_id（不刪除），回傳每則的群組 ID 清單"""
+    order = sorted(
+        range(len(articles)),
+        key=lambda i: (articles[i].get("published_at") or "", articles[i].get("id") or ""),
+    )
+    ordered = [articles[i] for i in order]
+    vectors = tfidf_vectors(ordered, dim_bits)
+    parent = list(range(len(ordered)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if vectors:
+        sig = simhash(vectors, bits)
+        bands = bits // band_bits
+        packed = sig[:, : bands * band_bits].reshape(len(ordered), bands, band_bits)
+        keys = packed @ (1 << np.arange(band_bits, dtype=np.int64))
+        buckets = {}
+        for i, row in enumerate(keys.tolist()):
+            if not len(vectors[i][0]):
+                continue
+            candidates = set()
+            for band, key in enumerate(row):
+                candidates.update(buckets.setdefault((band, key), []))
+                buckets[(band, key)].append(i)
+            for j in sorted(candidates):
+                ri, rj = find(i), find(j)
+                if ri != rj and cosine(vectors[i], vectors[j]) >= threshold:
+                    # 保留較早的成員為根，群組 ID 才會穩定
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    ids = [None] * len(articles)
+    for pos, i in enumerate(order):
+        root = ordered[find(pos)]
+        key = root.get("id") or root.get("url") or root.get("title") or str(pos)
+        ids[i] = "s" + sha1(key)[:10]
+        articles[i]["cluster_id"] = ids[i]
+    return ids
+
+
+def group_stories(articles, cfg=None):
+    """聚類後每個事件只留規則分數最高的一則（同分取先出現者），回傳 (代表文章, 統計)
+
+    其他成員是不同的文章，不沿用代表的評分，只記到代表的 duplicates 供候選看板的去重說明列出。
+    """
+    cfg = dict(cfg or {})
+    if not articles or not cfg.pop("enabled", True):
+        return articles, {}
+    ids = cluster_stories(articles, **cfg)
+    scores = rule_scores(articles)
+    best = {}
+    for i, cid in enumerate(ids):
+        if cid not in best or scores[i] > scores[best[cid]]:
+            best[cid] = i
+    reps = [a for i, (a, cid) in enumerate(zip(articles, ids)) if best[cid] == i]
+    for i, (a, cid) in enumerate(zip(articles, ids)):
+        if best[cid] != i:
+            rep = articles[best[cid]]
+            rep.setdefault("duplicates", []).append(
+                {"source": a.get("source", ""), "url": a.get("url", ""), "title": a.get("title", "")}
+            )
+            rep["duplicates"].extend(a.get("duplicates", []))
+    stats = {"story_clusters": len(reps), "story_members_skipped": len(articles) - len(reps)}
+    print(f"🧩 事件聚類：{len(articles)} 則歸為 {len(reps)} 個事件，只評分各事件代表")
+    return reps, stats
@@ -9,88 +9,33 @@
 
 import os
 import sys
-import json
+import time
+import threading
 import yaml
-import pandas as pd
 from datetime import datetime, timezone, timedelta
-import google.generativeai as genai
 from pathlib import Path
 
 # 添加專案根目錄到 Python 路徑
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-
-# 直接實現收集新聞功能
-def collect_news():
-    """收集新聞的簡化版本"""
-    import os
-    import requests
-    import feedparser
-    from datetime import datetime, timezone
-    from urllib.parse import urlencode
-
-    articles = []
-
-    # NewsAPI
-    api_key = os.getenv("NEWS_API_KEY")
-    if api_key:
-        try:
-            params = {
-                "q": "artificial intelligence",
-                "language": "en",
-                "pageSize": 50,
-                "sortBy": "publishedAt",
-            }
-            url = "https://newsapi.org/v2/everything?" + urlencode(params)
-            headers = {"X-Api-Key": api_key}
-            r = requests.get(url, headers=headers, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-
-            for a in data.get("articles", []):
-                articles.append(
-                    {
-                        "title": a.get("title", ""),
-                        "url": a.get("url", ""),
-                        "published_at": a.get("publishedAt", ""),
-                        "source": (a.get("source") or {}).get("name", "NewsAPI"),
-                        "summary": a.get("description") or "",
-                    }
-                )
-            print(f"NewsAPI 取得 {len(articles)} 則")
-        except Exception as e:
-            print(f"NewsAPI 錯誤: {e}")
-
-    # RSS 來源
-    rss_feeds = [
-        "https://feeds.feedburner.com/TechCrunch/",
-        "https://rss.cnn.com/rss/edition_technology.rss",
-    ]
-
-    for url in rss_feeds:
-        try:
-            d = feedparser.parse(url)
-            for e in d.entries[:10]:  # 限制每個來源10則
-                articles.append(
-                    {
-                        "title": getattr(e, "title", ""),
-                        "url": getattr(e, "link", ""),
-                        "published_at": getattr(
-                            e, "published", getattr(e, "updated", "")
-                        ),
-                        "source": d.feed.get("title", "RSS"),
-                        "summary": getattr(e, "summary", ""),
-                    }
-                )
-        except Exception as e:
-            print(f"RSS 錯誤 {url}: {e}")
-
-    print(f"總共收集 {len(articles)} 則新聞")
-    return articles
-
-
 from scripts.utils import load_yaml, write_json, read_json
+from scripts.collect import collect_news
+from scripts.near_dedup import collapse_near_duplicates
+from scripts.story_cluster import group_stories
+from scripts.seen_index import open_seen_index
+from scripts.extract import best_summary
+from scripts.cascade import prefilter, record_cascade
+from scripts.llm_batch import (
+    score_in_batches,
+    batch_config,
+    CANDIDATE_SCHEMA,
+    validate_candidate,
+)
+from scripts.llm_client import get_client
+from scripts.format_jobs import run_format_jobs, job_config, write_format, FORMAT_LABELS
+from scripts.format_a import SectionCache, Speculator, build_format_a, summary_prompt
+from scripts.renderers import render_apa, render_design, renderer_config
 
 
 class TwoStageWorkflow:
@@ -99,14 +44,13 @@ class TwoStageWorkflow:
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY 未設定")
 
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(
-            os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        )
-
         # 載入配置
         self.config = load_yaml("config/sources.yaml")
         self.prompts = load_yaml("config/prompts.yaml")
+        self.pipeline = load_yaml("config/pipeline.yaml") or {}
+
+        # 共用 LLM 用戶端（限流、退避與併發控制）
+        self.model = get_client(self.pipeline)
 
         # 設定時區
         self.tz = timezone(timedelta(hours=8))  # Asia/Taipei
@@ -121,11 +65,17 @@ class TwoStageWorkflow:
         self.candidates = []
         self.selected_items = []
 
+        # 格式 A 段落快取與背景預生成
+        self.sections = SectionCache(self.output_dir / "format_a_sections.json")
+        self.speculator = Speculator(
+            lambda prompt: self.model.generate(prompt, temperature=0.3), self.sections, self.today
+        )
+
     def stage1_ai_selection(self):
         """階段 1: AI 挑選新聞 → 候選清單"""
         print("🔄 階段 1: AI 挑選新聞...")
 
-        # 收集新聞
+        # 收集新聞（今日快照夠新就直接沿用，否則只抓增量）
         print("📰 收集新聞中...")
         articles = collect_news()
 
@@ -135,9 +85,24 @@ class TwoStageWorkflow:
 
         print(f"✅ 收集到 {len(articles)} 則新聞")
 
+        # 快照與增量紀錄合併後再做一次近似去重
+        articles = collapse_near_duplicates(articles)
+        print(f"🧹 去重後剩 {len(articles)} 則")
+
+        # 同一事件的多篇報導只評分一則代表，其餘併入代表的 duplicates，cluster_id 改為事件層級
+        articles, stories = group_stories(articles, self.pipeline.get("story_cluster"))
+
+        # 全部文章先以規則分數排序，只把預算內的前 K 則送 AI
+        articles, cascade = prefilter(articles, self.pipeline, self.model.max_concurrency)
+        cascade.update(stories)
+
         # AI 初步評分與分類
         print("🤖 AI 評分與分類中...")
-        self.candidates = self._ai_initial_scoring(articles)
+        started = time.perf_counter()
+        self.candidates = self._ai_initial_scoring(articles, cascade)
+        cascade["llm_seconds"] = round(time.perf_counter() - started, 3)
+        record_cascade("two_stage", cascade)
+        self.model.report()
 
         # 生成候選看板
         print("📊 生成候選看板...")
@@ -147,44 +112,45 @@ class TwoStageWorkflow:
         print("📋 候選看板已生成，請進行人工選擇")
         return True
 
-    def _ai_initial_scoring(self, articles):
-        """AI 初步評分與分類"""
-        candidates = []
-
-        for i, article in enumerate(articles[:20]):  # 限制前20則
-            try:
-                prompt = f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
+    def start_speculation(self):
+        """編輯挑選期間先在背景生成高分候選的格式 A 段落；只有會等待人工挑選的互動 / Web 模式才呼叫"""
+        cfg = self.pipeline.get("speculative") or {}
+        if cfg.get("enabled", True) and self.candidates:
+            self.speculator.start(self.candidates, int(cfg.get("top_n", 12)))
 
-請以 繁體中文、時區 Asia/Taipei，依 [今天日期：{self.today}] 對以下新聞進行評分與分類：
+    def _ai_initial_scoring(self, articles, stats=None):
+        """AI 初步評分與分類（多則新聞打包成一次呼叫）"""
 
-標題：{article['title']}
-摘要：{article.get('summary', '')}
+        def render(article):
+            return f"""標題：{article['title']}
+摘要：{best_summary(article)}
 來源：{article.get('source', '')}
 時間：{article.get('published_at', '')}
-URL：{article.get('url', '')}
-
-請輸出 JSON 格式：
-{{
-    "category": "模型發布/AI開發工具/企業應用/重大融資/研究突破",
-    "key_point": "一句重點（≤30字）",
-    "key_data": "關鍵數據（最多3個「指標:數值」；缺則寫「—」）",
-    "tech_score": 0-5,
-    "impact_score": 0-5,
-    "practical_score": 0-5,
-    "timely_score": 0-5,
-    "total_score": "四項加權求和，保留1位小數",
-    "hours_ago": "距今幾小時",
-    "cluster_id": "同題相同ID（如果與其他新聞相同）"
-}}"""
-
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(temperature=0.2),
-                )
-
-                data = json.loads(response.text.strip())
-
-                candidate = {
+URL：{article.get('url', '')}"""
+
+        header = f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
+
+請以 繁體中文、時區 Asia/Taipei，依 [今天日期：{self.today}] 對以下新聞逐則進行評分與分類。"""
+        results = score_in_batches(
+            articles,
+            render,
+            header,
+            CANDIDATE_SCHEMA,
+            lambda prompt: self.model.generate(prompt, temperature=0.2, use_cache=False),
+            validate_candidate,
+            workers=self.model.max_concurrency,
+            stats=stats,
+            cache=self.model.item_cache(temperature=0.2),
+            **batch_config(self.pipeline, output_tokens_per_item=150),
+        )
+
+        candidates = []
+        for i, (article, data) in enumerate(zip(articles, results)):
+            if data is None:
+                print(f"⚠️ 處理新聞 {i+1} 時出錯: 沒有取得有效評分")
+                continue
+            candidates.append(
+                {
                     "id": i + 1,
                     "title": article["title"],
                     "summary": article.get("summary", ""),
@@ -200,14 +166,11 @@ URL：{article.get('url', '')}
                     "timely_score": data.get("timely_score", 0),
                     "total_score": float(data.get("total_score", 0)),
                     "hours_ago": data.get("hours_ago", ""),
-                    "cluster_id": data.get("cluster_id", f"cluster_{i}"),
+                    "article_id": article.get("id", ""),
+                    "cluster_id": article.get("cluster_id", f"cluster_{i}"),
+                    "duplicates": article.get("duplicates", []),
                 }
-
-                candidates.append(candidate)
-
-            except Exception as e:
-                print(f"⚠️ 處理新聞 {i+1} 時出錯: {e}")
-                continue
+            )
 
         # 按總分排序
         candidates.sort(key=lambda x: x["total_score"], reverse=True)
@@ -223,9 +186,6 @@ URL：{article.get('url', '')}
         if not self.candidates:
             return
 
-        # 建立 DataFrame
-        df = pd.DataFrame(self.candidates)
-
         # 生成表格格式
         board = []
         board.append("# 候選看板")
@@ -289,6 +249,8 @@ URL：{article.get('url', '')}
             if cluster_id not in clusters:
                 clusters[cluster_id] = []
             clusters[cluster_id].append(f"{candidate['id']}: {candidate['source']}")
+            for dup in candidate.get("duplicates", []):
+                clusters[cluster_id].append(f"{dup['source']}（已合併）")
 
         for cluster_id, sources in clusters.items():
             if len(sources) > 1:
@@ -380,120 +342,109 @@ URL：{article.get('url', '')}
 
         print("🔄 階段 2: AI 產出分析與格式...")
 
-        # 生成三種格式
-        format_a = self._generate_format_a()
-        format_b = self._generate_format_b()
-        format_c = self._generate_format_c()
+        # 三種格式並行生成，每完成一種就寫檔
+        formats = self.generate_formats()
+        if None in formats.values():
+            print("❌ 部分格式生成失敗，已完成的格式仍已儲存")
+            return False
 
         # 儲存結果
-        self._save_results(format_a, format_b, format_c)
+        self._save_summary(formats["format_a"], formats["format_b"], formats["format_c"])
 
         print("✅ 階段 2 完成！")
         return True
 
-    def _generate_format_a(self):
-        """生成格式 A: 社群傳播版"""
-        prompt = f"""你是一位專業的 AI 產業內容策展人與創新實踐者。
-
-請以 繁體中文、時區 Asia/Taipei，依 [今天日期：{self.today}] 為以下選中的新聞生成【格式A：社群傳播版】：
-
-{json.dumps(self.selected_items, ensure_ascii=False, indent=2)}
-
-請按照以下結構輸出：
-
-【格式A：社群傳播版】
-
-{self._get_format_a_structure()}
-
-格式要求：
-- 使用 emoji 突出分類與亮點
-- 語氣專業、簡潔，偏向產業觀點
-- 不要贅述背景故事，聚焦「新 → 有數據 → 有行動」
-- 每篇新聞都要有完整的結構"""
-
-        response = self.model.generate_content(
-            prompt, generation_config=genai.types.GenerationConfig(temperature=0.3)
-        )
-
-        return response.text.strip()
-
-    def _get_format_a_structure(self):
-        """取得格式 A 的結構模板"""
-        return """🏷️【分類】新聞標題
-
-💡一句話重點（≤20 字）
-
-摘要（120–150 字）：核心事實 + 2–3 關鍵訊息 + 影響範圍
-
-關鍵洞察：
-技術突破：X
-實務影響：X
-行動建議：X
-
-創新實踐者反思：
-→ 跨界連結：X
-→ 實踐路徑：X
-→ 核心啟發：X
-
----
-
-📊 最後總結
-【今日三大趨勢】：列 3 點（每點 ≤20 字）
-【金句洞察】：1 句
-【立即行動】：角色＋時間＋具體行動＋量化效果"""
-
-    def _generate_format_b(self):
-        """生成格式 B: APA 7 引用格式"""
-        prompt = f"""請為以下新聞生成【格式B：APA 7 引用格式】：
-
-{json.dumps(self.selected_items, ensure_ascii=False, indent=2)}
-
-請輸出 5 條 APA 7 格式的引用，格式如下：
-Author. (Year, Month Day). Title. Publisher/Source. URL
-
-每條都必須包含 URL。"""
-
-        response = self.model.generate_content(
-            prompt, generation_config=genai.types.GenerationConfig(temperature=0.1)
+    def generate_formats(self, on_progress=None, on_chunk=None):
+        """三種格式並行生成（各自逾時與重試），每完成一種就寫檔並呼叫 on_progress(名稱, 文字, 已完成數, 總數)
+
+        給 on_chunk 時改用串流回應，逐段呼叫 on_chunk(名稱, 片段)；片段為 None 表示該格式重新開始。
+        逾時被放棄的舊請求仍會繼續產生片段，每次開始都有自己的嘗試編號，
+        只轉送目前這一次、且該格式尚未完成的片段。
+        """
+        lock = threading.Lock()
+        current = {}
+        finished = set()
+
+        def done(name, text, completed, total):
+            with lock:
+                finished.add(name)
+            if text is not None:
+                write_format(self.output_dir, name, text)
+                print(f"📝 {FORMAT_LABELS[name]} 完成（{completed}/{total}）")
+            if on_progress:
+                on_progress(name, text, completed, total)
+
+        def job(name, generate):
+            if on_chunk is None:
+                return generate
+
+            def forward(attempt, piece):
+                with lock:
+                    if name not in finished and current.get(name) == attempt:
+                        on_chunk(name, piece)
+
+            def run():
+                with lock:
+                    attempt = current[name] = current.get(name, 0) + 1
+                forward(attempt, None)
+                return generate(on_chunk=lambda piece: forward(attempt, piece))
+
+            return run
+
+        jobs = {
+            "format_a": job("format_a", self._generate_format_a),
+            "format_b": job("format_b", self._generate_format_b),
+            "format_c": job("format_c", self._generate_format_c),
+        }
+        return run_format_jobs(jobs, on_done=done, **job_config(self.pipeline))
+
+    def _generate_format_a(self, on_chunk=None):
+        """生成格式 A: 社群傳播版（組合各則段落，再補一次最後總結）"""
+        # 未選中的預生成不再需要；選中但尚未開始的改由前景並行生成
+        self.speculator.stop()
+
+        def summarize(sections, on_chunk):
+            response = self.model.generate_content(
+                summary_prompt(sections, self.today), temperature=0.3, on_chunk=on_chunk
+            )
+            return response.text.strip()
+
+        return build_format_a(
+            self.selected_items,
+            self.speculator.section,
+            summarize,
+            self.model.max_concurrency,
+            on_chunk,
         )
 
-        return response.text.strip()
-
-    def _generate_format_c(self):
-        """生成格式 C: 視覺設計版"""
-        prompt = f"""請為以下新聞生成【格式C：視覺設計版】：
-
-{json.dumps(self.selected_items, ensure_ascii=False, indent=2)}
-
-每則兩行：
-第 1 行：[類別]
-第 2 行：[精煉重點 10–15 字]
-
-請輸出 5 則，每則用換行分隔。"""
-
-        response = self.model.generate_content(
-            prompt, generation_config=genai.types.GenerationConfig(temperature=0.2)
+    def _generate_format_b(self, on_chunk=None):
+        """生成格式 B: APA 7 引用格式（本地產生，不呼叫 LLM）"""
+        text = render_apa(self.selected_items)
+        if on_chunk:
+            on_chunk(text)
+        return text
+
+    def _generate_format_c(self, on_chunk=None):
+        """生成格式 C: 視覺設計版（本地產生，只有缺資料的項目才請 LLM 精煉）"""
+        cfg = renderer_config(self.pipeline)
+        generate = None
+        if cfg["polish"]:
+            generate = lambda prompt: self.model.generate(prompt, temperature=0.2, use_cache=False)
+        text = render_design(
+            self.selected_items, generate, cfg["max_chars"], self.model.item_cache(temperature=0.2)
         )
-
-        return response.text.strip()
+        if on_chunk:
+            on_chunk(text)
+        return text
 
     def _save_results(self, format_a, format_b, format_c):
         """儲存結果"""
-        # 儲存格式 A
-        format_a_file = self.output_dir / "format_a_social_tw.md"
-        with open(format_a_file, "w", encoding="utf-8") as f:
-            f.write(format_a)
-
-        # 儲存格式 B
-        format_b_file = self.output_dir / "format_b_apa_tw.md"
-        with open(format_b_file, "w", encoding="utf-8") as f:
-            f.write(format_b)
-
-        # 儲存格式 C
-        format_c_file = self.output_dir / "format_c_design_tw.txt"
-        with open(format_c_file, "w", encoding="utf-8") as f:
-            f.write(format_c)
+        for name, text in (("format_a", format_a), ("format_b", format_b), ("format_c", format_c)):
+            write_format(self.output_dir, name, text)
+        self._save_summary(format_a, format_b, format_c)
 
+    def _save_summary(self, format_a, format_b, format_c):
+        """儲存完整結果並更新已見索引（各格式檔案已於完成時寫入）"""
         # 儲存完整結果
         full_result = f"""# AI 新聞自動化結果
 日期: {self.today}
@@ -518,8 +469,22 @@ Author. (Year, Month Day). Title. Publisher/Source. URL
 
         print(f"📁 結果已儲存到: {self.output_dir}")
 
+        # 已發布的文章記入已見索引
+        seen = open_seen_index(self.pipeline.get("seen_index"))
+        if seen is not None:
+            seen.mark_published(
+                c["article_id"] for c in self.selected_items if c.get("article_id")
+            )
+            seen.save()
+
     def run_full_workflow(self, manual_commands=None):
         """執行完整工作流程"""
+        try:
+            return self._run_full_workflow(manual_commands)
+        finally:
+            self.speculator.close()
+
+    def _run_full_workflow(self, manual_commands=None):
         print("🚀 開始兩階段 AI 新聞工作流程")
         print(f"📅 日期: {self.today}")
         print("=" * 50)
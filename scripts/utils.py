@@ -1,32 +1,94 @@
-import os, json, hashlib
+import os, json, hashlib, tempfile
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from dateutil import parser as dtparser
 
 TZ = timezone.utc
 
+# 各來源最近一次成功的時間格式，下次優先嘗試
+_FORMAT_BY_SOURCE = {}
+
 def today_path():
     return datetime.now(TZ).strftime("%Y/%m/%d")
 
 def iso_now():
     return datetime.now(TZ).isoformat()
 
+def estimate_tokens(text):
+    """粗估 token 數：英數約 4 字元一個 token，中文等非 ASCII 字元約一字一個"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
 def sha1(text: str) -> str:
     return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
+def _parse_iso(value):
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+def _parse_rfc822(value):
+    return parsedate_to_datetime(value)
+
+def _parse_any(value):
+    return dtparser.parse(value)
+
+_PARSERS = {"iso": _parse_iso, "rfc822": _parse_rfc822, "dateutil": _parse_any}
+
+def parse_timestamp(value, source=None):
+    """解析時間字串為 UTC datetime；ISO-8601 / RFC-822 走快速路徑，最後才用 dateutil
+
+    有指定 source 時記住該來源的快速格式，之後優先嘗試；dateutil 不記住，
+    一次格式異常不會讓該來源之後都跳過快速路徑。無法解析回傳 None。
+    """
+    if not value or not isinstance(value, str):
+        return None
+    known = _FORMAT_BY_SOURCE.get(source)
+    order = (known,) + tuple(k for k in _PARSERS if k != known) if known else tuple(_PARSERS)
+    for kind in order:
+        try:
+            dt = _PARSERS[kind](value)
+        except (ValueError, TypeError, IndexError, OverflowError):
+            continue
+        if dt is None: continue
+        if source is not None and kind != "dateutil": _FORMAT_BY_SOURCE[source] = kind
+        if dt.tzinfo is None: dt = dt.replace(tzinfo=TZ)
+        return dt.astimezone(TZ)
+    return None
+
+def article_epoch(item):
+    """文章發布時間（epoch 秒）；優先使用 normalize_article 預先算好的 published_ts"""
+    ts = item.get("published_ts")
+    if ts is not None: return ts
+    dt = parse_timestamp(item.get("published_at"))
+    return dt.timestamp() if dt else None
+
 def normalize_article(title, url, published_at, source, summary=""):
-    try:
-        ts = dtparser.parse(published_at).astimezone(TZ).isoformat()
-    except Exception:
-        ts = iso_now()
-    return {"id": sha1(url or title or ts), "title": title or "", "url": url, "published_at": ts, "source": source, "summary": summary or ""}
+    parsed = parse_timestamp(published_at, source)
+    dt = parsed or datetime.now(TZ)
+    ts = dt.isoformat()
+    article = {"id": sha1(url or title or ts), "title": title or "", "url": url, "published_at": ts, "published_ts": int(dt.timestamp()), "source": source, "summary": summary or ""}
+    # 發布時間無法解析時以收集時間代替；這類文章不參與水位，改由已見索引判斷新舊
+    if parsed is None: article["undated"] = True
+    return article
 
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
 def write_json(path, data):
-    ensure_dir(os.path.dirname(path))
-    with open(os.path.join(path), "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """先寫同目錄的暫存檔再 os.replace，多個執行緒同時寫同一檔（如 hedged 請求的 feed 快取）也不會留下半份 JSON"""
+    directory = os.path.dirname(path) or "."
+    ensure_dir(directory)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp, 0o644)  # mkstemp 預設 0600，維持一般檔案權限
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
 
 def load_yaml(path):
     import yaml
@@ -39,8 +101,37 @@ def read_json(path, default=None):
         return json.load(f)
 
 def to_display_date(iso_ts):
-    try:
-        d = dtparser.parse(iso_ts).date().isoformat()
-        return d
-    except Exception:
-        return iso_ts[:10]
\ No newline at end of file
+    # 已正規化的 ISO 字串前 10 碼即為日期，不必再解析
+    if isinstance(iso_ts, str) and len(iso_ts) >= 10 and iso_ts[4] == "-" and iso_ts[7] == "-" and iso_ts[:4].isdigit():
+        return iso_ts[:10]
+    dt = parse_timestamp(iso_ts)
+    return dt.date().isoformat() if dt else (iso_ts or "")[:10]
+
+def iter_jsonl(path):
+    """逐行讀取 JSONL，不把整個檔案載入記憶體"""
+    if not os.path.exists(path): return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+def read_jsonl(path):
+    return list(iter_jsonl(path))
+
+def append_jsonl(path, rows):
+    ensure_dir(os.path.dirname(path))
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def iter_raw_articles(base):
+    """逐則產出當日原始新聞：完整快照 raw_news.json + 增量追加的 raw_news.jsonl（依 id 去重）"""
+    seen = set()
+    for rows in (read_json(f"{base}/raw_news.json", default=[]) or [], iter_jsonl(f"{base}/raw_news.jsonl")):
+        for a in rows:
+            if a.get("id") in seen: continue
+            seen.add(a.get("id"))
+            yield a
+
+def load_raw_articles(base):
+    return list(iter_raw_articles(base))
+
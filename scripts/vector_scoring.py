@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+欄位式批次評分
+把一天（或整個封存庫）的文章一次載入 DataFrame，關鍵字命中、新鮮度、發布者加權
+與 LLM 混合分數都以欄位運算完成，Top-K 以 argpartition 取得，回測百萬篇也只需數秒。
+規則與 process.rule_score / keyword_matcher 完全一致。
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path for imports
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from scripts.utils import article_epoch
+from scripts.keyword_matcher import get_scorer
+
+RULE_WEIGHT = 0.6
+LLM_WEIGHT = 0.8
+SCORE_FIELDS = ("tech", "impact", "practical", "timely")
+_ALNUM = np.zeros(256, dtype=bool)
+_ALNUM[np.frombuffer(b"abcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)] = True
+
+
+def articles_frame(articles):
+    """文章清單 → DataFrame（title / summary / source / published_ts）"""
+    if isinstance(articles, pd.DataFrame):
+        df = articles
+    else:
+        df = pd.DataFrame.from_records(
+            articles, columns=["title", "summary", "source", "published_at", "published_ts"]
+        )
+    ts = np.array(pd.to_numeric(df["published_ts"], errors="coerce"), dtype=float)
+    missing = np.flatnonzero(np.isnan(ts) & df["published_at"].notna().to_numpy())
+    if len(missing):
+        # 舊資料沒有 published_ts，逐筆補解析（只有這些列走 Python）
+        epochs = [article_epoch({"published_at": v}) for v in df["published_at"].iloc[missing]]
+        ts[missing] = [np.nan if e is None else e for e in epochs]
+    return df.assign(published_ts=ts)
+
+
+def _texts(df):
+    titles = df["title"].fillna("").astype(str)
+    summaries = df["summary"].fillna("").astype(str)
+    return [f"{t} {s}".replace("\n", " ") for t, s in zip(titles, summaries)]
+
+
+def _byte_matches(texts, keywords):
+    """在串接後的位元組陣列上找出所有關鍵字命中，回傳 (列, 關鍵字索引)
+
+    先以 NumPy 找出所有字首位置，再用前兩個位元組查表篩掉不可能的位置，
+    其餘字元與字尾邊界（含複數 s / es）逐一向量化比對，與 keyword_matcher 規則相同。
+    沒有任何關鍵字時回傳空的索引陣列（不命中）。
+    """
+    if not keywords:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    buf = ("\n" + "\n".join(texts).lower() + "\n\0\0\0").encode("utf-8")
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    row_starts = np.flatnonzero(arr == 10)
+    alnum = _ALNUM[arr]
+    starts = np.flatnonzero(alnum[1:] & ~alnum[:-1]) + 1
+    prefix = arr[starts].astype(np.uint16) * 256 + arr[starts + 1]
+    table = np.zeros(65536, dtype=bool)
+    for word in keywords:
+        table[word[0] * 256 + word[1]] = True
+    keep = table[prefix]
+    starts, prefix = starts[keep], prefix[keep]
+    rows, hits = [], []
+    for i, word in enumerate(keywords):
+        pos = starts[prefix == word[0] * 256 + word[1]]
+        for j in range(2, len(word)):
+            pos = pos[arr[pos + j] == word[j]]
+        end = pos + len(word)
+        c0, c1, c2 = arr[end], arr[end + 1], arr[end + 2]
+        ok = ~_ALNUM[c0] | ((c0 == ord("s")) & ~_ALNUM[c1])
+        ok |= (c0 == ord("e")) & (c1 == ord("s")) & ~_ALNUM[c2]
+        pos = pos[ok]
+        rows.append(np.searchsorted(row_starts, pos, side="right") - 1)
+        hits.append(np.full(len(pos), i))
+    return np.concatenate(rows), np.concatenate(hits)
+
+
+def keyword_hits(df, scorer=None, chunk=50000):
+    """各組命中的關鍵字數（每列每個關鍵字只算一次），回傳 DataFrame"""
+    scorer = scorer or get_scorer()
+    words = sorted(scorer.group_of)
+    member = np.array(
+        [[g in scorer.group_of[w] for g in scorer.groups] for w in words], dtype=float
+    ).reshape(len(words), len(scorer.groups))
+    texts = _texts(df)
+    counts = np.zeros((len(texts), len(scorer.groups)))
+    encoded = [w.encode("utf-8") for w in words]
+    vectorizable = all(len(w) > 1 and _ALNUM[w[0]] for w in encoded)
+    index = {w: i for i, w in enumerate(words)}
+    for lo in range(0, len(texts), chunk):
+        part = texts[lo : lo + chunk]
+        found = np.zeros((len(part), len(words)), dtype=bool)
+        if vectorizable:
+            found[_byte_matches(part, encoded)] = True
+        else:
+            # 含單字元或非英數開頭的關鍵字時改用編譯好的正規表示式逐列比對
+            for r, text in enumerate(part):
+                found[r, [index[w] for w in scorer.matches(text)]] = True
+        counts[lo : lo + len(part)] = found @ member
+    return pd.DataFrame(counts, columns=scorer.groups, index=df.index).astype(int)
+
+
+def keyword_points(df, scorer=None):
+    scorer = scorer or get_scorer()
+    hits = keyword_hits(df, scorer)
+    points = np.array([scorer.points.get(g, 0) for g in hits.columns], dtype=float)
+    return hits.to_numpy() @ points
+
+
+def recency_points(df, now=None):
+    """發布 0 天內 +5、每多一天 -1；沒有時間的文章 +1"""
+    now = now or datetime.now(timezone.utc).timestamp()
+    ts = df["published_ts"].to_numpy(dtype=float)
+    days = np.floor((now - ts) / 86400)
+    return np.where(np.isnan(ts), 1.0, np.maximum(0.0, 5 - days))
+
+
+def publisher_points(df, scorer=None):
+    scorer = scorer or get_scorer()
+    source = df["source"].fillna("").astype(str)
+    boosted = {s: scorer.is_boosted(s) for s in source.unique()}
+    return source.map(boosted).to_numpy(dtype=bool) * float(scorer.boost_points)
+
+
+def rule_scores(articles, now=None):
+    """與 rule_score 相同的規則分數（整數陣列）"""
+    df = articles_frame(articles)
+    scorer = get_scorer()
+    total = keyword_points(df, scorer) + recency_points(df, now) + publisher_points(df, scorer)
+    return total.astype(int)
+
+
+def blend_scores(rule, refined):
+    """有 LLM 分數者取 round(0.6·規則 + 0.8·LLM)，其餘沿用規則分數"""
+    rule = np.asarray(rule, dtype=float)
+    llm = np.array([np.nan if r is None else r for r in refined], dtype=float)
+    mixed = np.round(RULE_WEIGHT * rule + LLM_WEIGHT * llm)
+    return np.where(np.isnan(llm), rule, mixed).astype(int)
+
+
+def top_k(scores, k):
+    """分數最高的 k 個索引（高分在前，同分保留原順序，與穩定排序結果相同）"""
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=int)
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    idx = np.concatenate([above, ties])
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+def rank_articles(articles, k=None, now=None):
+    """依規則分數排序文章，回傳 (前 k 篇, 對應分數)"""
+    scores = rule_scores(articles, now)
+    order = top_k(scores, len(scores) if k is None else k)
+    return [articles[i] for i in order], scores[order]
+
+
+def weighted_totals(candidates, weights):
+    """候選清單四項評分（0-5）依百分比權重加總，保留 1 位小數"""
+    df = pd.DataFrame.from_records(
+        candidates, columns=[f"{name}_score" for name in SCORE_FIELDS]
+    )
+    scores = df.apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+    w = np.array([weights[name] for name in SCORE_FIELDS], dtype=float) / 100
+    return np.round(scores @ w, 1)